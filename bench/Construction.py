@@ -0,0 +1,203 @@
+"""
+Benchmark constructing Network, NetworkMesh, Server, ServerFleet, Cluster & ClusterFleet at increasing scales, offline.
+
+    python -m bench.Construction --scales 1,10,50 --save baseline.json
+    python -m bench.Construction --scales 1,10,50 --compare baseline.json
+    python -m bench.Construction --scenarios fleet --scales 200 --trace fleet.trace.json
+
+Records wall time, invoke count, resource count & peak memory for each scenario & scale.
+--compare exits non zero when invoke or resource counts grow, or wall time or memory grow by more than --tolerance.
+--trace writes the spans of every component, invoke & key generation to a chrome trace.
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import bench.Mocks as Mocks
+import util.Trace as Trace
+
+DEFAULT_SCALES = [1, 10, 50]
+DEFAULT_TOLERANCE = 0.25
+
+
+def _network(name):
+    from network.Network import Network
+    return Network(name, subnet_count=3, vpc_tags={"Name": name}, sg_tags={"Name": name})
+
+
+def build_network(scale):
+    for i in range(scale):
+        _network("network-%d" % i)
+
+
+def build_server(scale):
+    from compute.Server import Server
+    network = _network("network")
+    for i in range(scale):
+        Server("server-%d" % i, security_groups=[network.private_sg], tags={"Name": "server-%d" % i, "type": "server"},
+               subnet_id=network.private_subnets[i % len(network.private_subnets)])
+
+
+def build_fleet(scale):
+    from compute.ServerFleet import ServerFleet
+    network = _network("network")
+    ServerFleet("fleet", count=scale, security_groups=[network.private_sg], tags={"type": "server"}, network=network)
+
+
+def build_cluster(scale):
+    from compute.EKS import Cluster
+    network = _network("network")
+    for i in range(scale):
+        Cluster("cluster-%d" % i, node_count=3, vpc_id=network.vpcid, subnet_ids=network.private_subnets,
+                version="1.14.8", bastion_sg_id=network.public_sg)
+
+
+def build_cluster_fleet(scale):
+    from compute.ClusterFleet import ClusterFleet
+    network = _network("network")
+    ClusterFleet("cluster", count=scale, node_count=3, vpc_id=network.vpcid, subnet_ids=network.private_subnets,
+                 version="1.14.8", bastion_sg_id=network.public_sg)
+
+
+def build_mesh(scale):
+    from network.Mesh import NetworkMesh
+    NetworkMesh("mesh", vpcs=[{"name": "vpc-%d" % i, "subnet_count": 3} for i in range(scale)])
+
+
+# scenario name -> (build function, the scales it supports, None for any)
+SCENARIOS = {
+    "network": (build_network, None),
+    "server": (build_server, None),
+    "fleet": (build_fleet, None),
+    "cluster": (build_cluster, None),
+    "eksfleet": (build_cluster_fleet, None),
+    "mesh": (build_mesh, None),
+}
+
+
+def measure(scenario, scale):
+    """
+    Build a scenario at a scale against the mocks & return its measurements. tracemalloc slows every allocation, so
+    the scenario is timed in one run & its peak memory taken in a second
+    """
+    build, _ = SCENARIOS[scenario]
+    mocks = Mocks.BenchMocks()
+
+    gc.collect()
+    start = time.perf_counter()
+    monitor = Mocks.run(lambda: build(scale), mocks)
+    wall_time = time.perf_counter() - start
+
+    gc.collect()
+    tracemalloc.start()
+    Mocks.run(lambda: build(scale))
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "scenario": scenario,
+        "scale": scale,
+        "wall_time": wall_time,
+        "invokes": sum(mocks.invokes.values()),
+        "resources": len(monitor.registrations),
+        "peak_memory": peak_memory,
+    }
+
+
+def run_all(scenarios=None, scales=None):
+    os.environ.setdefault("PAVE_WORKSTATION_IP", Mocks.WORKSTATION_IP)
+    # import the components up front so the first scenario does not pay for every SDK import
+    import network.Network, network.Mesh, compute.Server, compute.ServerFleet, compute.EKS, compute.ClusterFleet
+    results = []
+    for scenario in (scenarios or sorted(SCENARIOS)):
+        supported = SCENARIOS[scenario][1]
+        for scale in (scales or DEFAULT_SCALES):
+            if supported is not None and scale not in supported:
+                continue
+            results.append(measure(scenario, scale))
+    return results
+
+
+def compare(baseline, results, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compare results against a baseline. Returns a list of regressions, each a human readable line
+    """
+    previous = dict(((r["scenario"], r["scale"]), r) for r in baseline)
+    regressions = []
+    for result in results:
+        before = previous.get((result["scenario"], result["scale"]))
+        if before is None:
+            continue
+        label = "%s@%d" % (result["scenario"], result["scale"])
+        for metric in ("invokes", "resources"):
+            if result[metric] > before[metric]:
+                regressions.append("%s %s %d -> %d" % (label, metric, before[metric], result[metric]))
+        for metric in ("wall_time", "peak_memory"):
+            if before[metric] and result[metric] > before[metric] * (1 + tolerance):
+                regressions.append("%s %s %.3f -> %.3f" % (label, metric, before[metric], result[metric]))
+    return regressions
+
+
+def _print_table(results, baseline=None):
+    previous = dict(((r["scenario"], r["scale"]), r) for r in (baseline or []))
+    print("%-10s %6s %10s %8s %10s %12s" % ("scenario", "scale", "wall (s)", "invokes", "resources", "peak (KiB)"))
+    for r in results:
+        line = "%-10s %6d %10.3f %8d %10d %12d" % (r["scenario"], r["scale"], r["wall_time"], r["invokes"],
+                                                   r["resources"], r["peak_memory"] // 1024)
+        before = previous.get((r["scenario"], r["scale"]))
+        if before is not None and before["wall_time"]:
+            line += "  (%+.0f%% wall)" % ((r["wall_time"] / before["wall_time"] - 1) * 100)
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark program construction against pulumi mocks")
+    parser.add_argument("--scenarios", help="comma separated scenarios. One or more of %s" % ", ".join(sorted(SCENARIOS)))
+    parser.add_argument("--scales", help="comma separated scales. Defaults to %s" % ",".join(map(str, DEFAULT_SCALES)))
+    parser.add_argument("--save", help="write the results to this file as a baseline")
+    parser.add_argument("--compare", help="compare the results against this baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed fractional growth in wall time & memory. Defaults to %s" % DEFAULT_TOLERANCE)
+    parser.add_argument("--trace", help="write a chrome trace of the construction to this file")
+    args = parser.parse_args(argv)
+
+    scenarios = args.scenarios.split(",") if args.scenarios else None
+    scales = [int(s) for s in args.scales.split(",")] if args.scales else None
+    tracer = None
+    if args.trace:
+        tracer = Trace.Tracer(args.trace, "chrome")
+        Trace.set_tracer(tracer)
+    results = run_all(scenarios, scales)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    _print_table(results, baseline)
+
+    if tracer is not None:
+        Trace.set_tracer(None)
+        tracer.export()
+        print("\n%-28s %12s %6s %10s %10s" % ("span", "category", "count", "total (s)", "max (s)"))
+        for total in tracer.summary()[:10]:
+            print("%-28s %12s %6d %10.3f %10.3f" % (total["name"], total["category"], total["count"], total["total"],
+                                                     total["max"]))
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+
+    if baseline is not None:
+        regressions = compare(baseline, results, args.tolerance)
+        for regression in regressions:
+            print("REGRESSION %s" % regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+"""
+Analyse the resource graph the components declare, offline, to see what holds a deploy up.
+
+    python -m bench.Graph --scenarios network,server,cluster
+    python -m bench.Graph --scenarios cluster --latencies latencies.json --json cluster.graph.json
+
+Each resource is given a create latency by its type, from DEFAULT_LATENCIES or a json file of type to seconds passed
+with --latencies. The report gives the critical path, the work that could run in parallel & the explicit depends_on
+dependencies: those already implied through other dependencies, & how much the deploy would shorten without each.
+The latencies are estimates, so the critical path is only as good as the table.
+"""
+import argparse
+import json
+import os
+import sys
+
+import bench.Construction as Construction
+import bench.Mocks as Mocks
+
+# rough create times in seconds, by resource type
+DEFAULT_LATENCIES = {
+    "pulumi:providers:aws": 0,
+    "aws:ec2/vpc:Vpc": 3,
+    "aws:ec2/vpcIpv4CidrBlockAssociation:VpcIpv4CidrBlockAssociation": 5,
+    "aws:ec2/subnet:Subnet": 5,
+    "aws:ec2/internetGateway:InternetGateway": 3,
+    "aws:ec2/routeTable:RouteTable": 3,
+    "aws:ec2/route:Route": 2,
+    "aws:ec2/routeTableAssociation:RouteTableAssociation": 1,
+    "aws:ec2/eip:Eip": 2,
+    "aws:ec2/natGateway:NatGateway": 120,
+    "aws:ec2/vpcEndpoint:VpcEndpoint": 90,
+    "aws:ec2/securityGroup:SecurityGroup": 3,
+    "aws:ec2/securityGroupRule:SecurityGroupRule": 2,
+    "aws:ec2/instance:Instance": 30,
+    "aws:ec2/placementGroup:PlacementGroup": 2,
+    "aws:ec2/launchTemplate:LaunchTemplate": 2,
+    "aws:ec2transitgateway/transitGateway:TransitGateway": 180,
+    "aws:ec2transitgateway/vpcAttachment:VpcAttachment": 60,
+    "aws:ec2transitgateway/peeringAttachment:PeeringAttachment": 120,
+    "aws:ec2transitgateway/peeringAttachmentAccepter:PeeringAttachmentAccepter": 60,
+    "aws:iam/role:Role": 2,
+    "aws:iam/instanceProfile:InstanceProfile": 10,
+    "aws:iam/policyAttachment:PolicyAttachment": 2,
+    "aws:iam/rolePolicyAttachment:RolePolicyAttachment": 2,
+    "aws:eks/cluster:Cluster": 600,
+    "aws:eks/addon:Addon": 60,
+    "aws:autoscaling/group:Group": 60,
+}
+DEFAULT_LATENCY = 5
+
+
+class DeployGraph(object):
+    """
+    The custom resources of a program & what each waits for. Dependencies on a component stand for its resources
+
+    :param registrations The registrations of a bench.Mocks.RecordingMonitor
+    :param latencies A dictionary of resource type to create latency in seconds. Merged over DEFAULT_LATENCIES
+    """
+    def __init__(self, registrations, latencies=None):
+        self.latencies = dict(DEFAULT_LATENCIES, **(latencies or {}))
+        self.resources = dict((r["urn"], r) for r in registrations if r["custom"])
+
+        children = {}
+        for r in registrations:
+            children.setdefault(r["parent"], []).append(r)
+
+        def expand(urn):
+            if urn in self.resources:
+                return {urn}
+            # a component, which is ready when everything under it is
+            found = set()
+            for child in children.get(urn, []):
+                found |= expand(child["urn"])
+            return found
+
+        # resource urn -> the urns it waits for, & those of them only there through depends_on
+        self.dependencies = {}
+        self.explicit = {}
+        for urn, r in self.resources.items():
+            through_inputs = set(u for urns in r["property_dependencies"].values() for u in urns)
+            dependencies = set()
+            explicit = set()
+            for dependency in r["dependencies"]:
+                expanded = expand(dependency) - {urn}
+                dependencies |= expanded
+                if dependency not in through_inputs:
+                    explicit |= expanded
+            if r["provider"]:
+                # a provider reference is urn::id
+                provider = r["provider"].rsplit("::", 1)[0]
+                if provider in self.resources:
+                    dependencies.add(provider)
+            self.dependencies[urn] = dependencies
+            self.explicit[urn] = explicit
+        self.order = self._topological_order()
+
+    def latency(self, urn):
+        return self.latencies.get(self.resources[urn]["type"], DEFAULT_LATENCY)
+
+    def _topological_order(self):
+        order = []
+        state = {}
+        for root in sorted(self.resources):
+            stack = [(root, False)]
+            while stack:
+                urn, done = stack.pop()
+                if done:
+                    state[urn] = "done"
+                    order.append(urn)
+                    continue
+                if state.get(urn) == "done":
+                    continue
+                if state.get(urn) == "visiting":
+                    raise ValueError("dependency cycle through %s" % urn)
+                state[urn] = "visiting"
+                stack.append((urn, True))
+                stack.extend((d, False) for d in sorted(self.dependencies[urn]) if state.get(d) != "done")
+        return order
+
+    def schedule(self, skip=None):
+        """
+        Return the start & finish of each resource with unlimited parallelism, each starting once all it waits for is done
+
+        :param skip A (resource, dependency) edge to leave out
+        """
+        start, finish = {}, {}
+        for urn in self.order:
+            waits_for = [d for d in self.dependencies[urn] if (urn, d) != skip]
+            start[urn] = max([finish[d] for d in waits_for] or [0])
+            finish[urn] = start[urn] + self.latency(urn)
+        return start, finish
+
+    def critical_path(self):
+        """
+        Return the resources of the longest chain of dependencies, first to last
+        """
+        _, finish = self.schedule()
+        if not finish:
+            return []
+        urn = max(sorted(finish), key=lambda u: finish[u])
+        path = [urn]
+        while self.dependencies[urn]:
+            urn = max(sorted(self.dependencies[urn]), key=lambda d: finish[d])
+            path.append(urn)
+        return list(reversed(path))
+
+    def peak_parallelism(self):
+        start, finish = self.schedule()
+        events = sorted([(finish[u], -1) for u in start if finish[u] > start[u]] +
+                        [(start[u], 1) for u in start if finish[u] > start[u]])
+        running = peak = 0
+        for _, change in events:
+            running += change
+            peak = max(peak, running)
+        return peak
+
+    def _reachable(self, urn, target, skip):
+        stack = [d for d in self.dependencies[urn] if (urn, d) != skip]
+        seen = set()
+        while stack:
+            current = stack.pop()
+            if current == target:
+                return True
+            if current not in seen:
+                seen.add(current)
+                stack.extend(self.dependencies[current])
+        return False
+
+    def explicit_dependencies(self):
+        """
+        Return each explicit depends_on edge, whether other dependencies already imply it & the seconds saved without it
+        """
+        _, finish = self.schedule()
+        makespan = max(finish.values() or [0])
+        edges = []
+        for urn in sorted(self.explicit):
+            for dependency in sorted(self.explicit[urn]):
+                edge = (urn, dependency)
+                _, without = self.schedule(skip=edge)
+                edges.append({
+                    "resource": urn,
+                    "dependency": dependency,
+                    "redundant": self._reachable(urn, dependency, edge),
+                    "saving": makespan - max(without.values()),
+                })
+        return edges
+
+    def report(self):
+        _, finish = self.schedule()
+        makespan = max(finish.values() or [0])
+        work = sum(self.latency(u) for u in self.resources)
+        path = self.critical_path()
+        start, _ = self.schedule()
+        return {
+            "resources": len(self.resources),
+            "makespan": makespan,
+            "work": work,
+            # the average amount of resources being created at once over the deploy
+            "parallelism": work / makespan if makespan else 0,
+            "peak_parallelism": self.peak_parallelism(),
+            "critical_path": [{"urn": u, "type": self.resources[u]["type"], "start": start[u], "latency": self.latency(u)}
+                              for u in path],
+            "explicit_dependencies": self.explicit_dependencies(),
+        }
+
+
+def analyse(scenario, scale=1, latencies=None):
+    """
+    Build a bench.Construction scenario against the mocks & return the report of its graph
+    """
+    build, _ = Construction.SCENARIOS[scenario]
+    monitor = Mocks.run(lambda: build(scale))
+    return dict(DeployGraph(monitor.registrations, latencies).report(), scenario=scenario, scale=scale)
+
+
+def _name(urn):
+    return urn.rsplit("::", 1)[-1]
+
+
+def _print_report(report):
+    print("%s@%d: %d resources, %.0fs critical path, %.0fs of work, %.1f average & %d peak parallelism"
+          % (report["scenario"], report["scale"], report["resources"], report["makespan"], report["work"],
+             report["parallelism"], report["peak_parallelism"]))
+    print("  critical path")
+    for step in report["critical_path"]:
+        print("    %7.0fs +%4.0fs  %-40s %s" % (step["start"], step["latency"], _name(step["urn"]), step["type"]))
+    edges = [e for e in report["explicit_dependencies"] if e["redundant"] or e["saving"]]
+    if edges:
+        print("  explicit dependencies")
+        for edge in sorted(edges, key=lambda e: -e["saving"]):
+            print("    %-40s -> %-40s %s saves %.0fs" % (_name(edge["resource"]), _name(edge["dependency"]),
+                                                      "redundant" if edge["redundant"] else "needed?  ", edge["saving"]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report the critical path & parallelism of the resource graph")
+    parser.add_argument("--scenarios", default="network,server,cluster",
+                        help="comma separated scenarios. One or more of %s" % ", ".join(sorted(Construction.SCENARIOS)))
+    parser.add_argument("--scale", type=int, default=1, help="the scale of each scenario")
+    parser.add_argument("--latencies", help="a json file of resource type to create latency in seconds")
+    parser.add_argument("--json", help="write the reports to this file")
+    args = parser.parse_args(argv)
+
+    latencies = None
+    if args.latencies:
+        with open(args.latencies) as f:
+            latencies = json.load(f)
+    os.environ.setdefault("PAVE_WORKSTATION_IP", Mocks.WORKSTATION_IP)
+
+    reports = [analyse(scenario, args.scale, latencies) for scenario in args.scenarios.split(",")]
+    for report in reports:
+        _print_report(report)
+        print("")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=1, sort_keys=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
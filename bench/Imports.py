@@ -0,0 +1,111 @@
+"""
+Benchmark how long importing the packages & components takes, each in a fresh interpreter.
+
+    python -m bench.Imports --save imports.json
+    python -m bench.Imports --compare imports.json
+
+Records the median import time of each target & the heavy SDKs it pulled in.
+--compare exits non zero when a target loads an SDK it did not before, or its import time grows by more than --tolerance.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+DEFAULT_REPEAT = 5
+DEFAULT_TOLERANCE = 0.25
+
+# the modules whose import each target is timed
+TARGETS = ["network", "compute", "util", "util.Util", "util.Lookup", "network.Network", "compute.Server",
+           "compute.ServerFleet", "compute.EKS"]
+
+# SDKs that are slow to import & only needed by some stacks
+HEAVY_MODULES = ["pulumi_aws", "pulumi_kubernetes", "cryptography", "requests"]
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import %s
+elapsed = time.perf_counter() - start
+print(json.dumps({"time": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+"""
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def probe(target):
+    """
+    Import target in a fresh interpreter. Returns the time it took & the heavy modules it loaded
+    """
+    output = subprocess.check_output([sys.executable, "-c", _PROBE % (target, HEAVY_MODULES)], cwd=_ROOT)
+    return json.loads(output.decode("utf-8").strip().splitlines()[-1])
+
+
+def measure(target, repeat=DEFAULT_REPEAT):
+    probes = [probe(target) for _ in range(repeat)]
+    return {
+        "target": target,
+        "import_time": statistics.median(p["time"] for p in probes),
+        "loaded": probes[0]["loaded"],
+    }
+
+
+def run_all(targets=None, repeat=DEFAULT_REPEAT):
+    return [measure(target, repeat) for target in (targets or TARGETS)]
+
+
+def compare(baseline, results, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compare results against a baseline. Returns a list of regressions, each a human readable line
+    """
+    previous = dict((r["target"], r) for r in baseline)
+    regressions = []
+    for result in results:
+        before = previous.get(result["target"])
+        if before is None:
+            continue
+        for module in sorted(set(result["loaded"]) - set(before["loaded"])):
+            regressions.append("%s now imports %s" % (result["target"], module))
+        if before["import_time"] and result["import_time"] > before["import_time"] * (1 + tolerance):
+            regressions.append("%s import_time %.3f -> %.3f" % (result["target"], before["import_time"],
+                                                                result["import_time"]))
+    return regressions
+
+
+def _print_table(results):
+    print("%-22s %10s  %s" % ("target", "import (s)", "heavy modules"))
+    for r in results:
+        print("%-22s %10.3f  %s" % (r["target"], r["import_time"], ", ".join(r["loaded"]) or "-"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark importing the packages in fresh interpreters")
+    parser.add_argument("--targets", help="comma separated modules. Defaults to %s" % ",".join(TARGETS))
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help="imports of each target, the median is kept. Defaults to %d" % DEFAULT_REPEAT)
+    parser.add_argument("--save", help="write the results to this file as a baseline")
+    parser.add_argument("--compare", help="compare the results against this baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed fractional growth in import time. Defaults to %s" % DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    results = run_all(args.targets.split(",") if args.targets else None, args.repeat)
+    _print_table(results)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), results, args.tolerance)
+        for regression in regressions:
+            print("REGRESSION %s" % regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
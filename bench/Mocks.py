@@ -0,0 +1,105 @@
+"""
+Pulumi mocks that let the components be constructed with no network or AWS access
+"""
+import collections
+
+import pulumi
+from pulumi.runtime import settings
+from pulumi.runtime.mocks import MockMonitor
+from pulumi.runtime.stack import run_pulumi_func
+from pulumi.runtime.sync_await import _sync_await
+
+import util.Lookup as Lookup
+import util.Trace as Trace
+from util.Cache import LookupCache
+
+WORKSTATION_IP = "192.0.2.1"
+
+ZONE_NAMES = ["us-east-1a", "us-east-1b", "us-east-1c", "us-east-1d", "us-east-1e", "us-east-1f"]
+ZONE_IDS = ["use1-az1", "use1-az2", "use1-az3", "use1-az4", "use1-az5", "use1-az6"]
+
+# canned invoke results keyed by token
+INVOKE_RESULTS = {
+    "aws:index/getAvailabilityZones:getAvailabilityZones": {"names": ZONE_NAMES, "zoneIds": ZONE_IDS},
+    "aws:ec2/getAmi:getAmi": {"id": "ami-0123456789abcdef0"},
+    "aws:index/getRegion:getRegion": {"name": "us-east-1", "region": "us-east-1"},
+    "aws:index/getCallerIdentity:getCallerIdentity": {"accountId": "123456789012"},
+    # an m5.large
+    "aws:ec2/getInstanceType:getInstanceType": {"maximumNetworkInterfaces": 3, "maximumIpv4AddressesPerInterface": 10,
+                                                "defaultVcpus": 2, "hypervisor": "nitro", "supportedArchitectures": ["x86_64"]},
+}
+
+# outputs the components read from resources that the mocks would not otherwise return
+RESOURCE_OUTPUTS = {
+    "aws:eks/cluster:Cluster": {"endpoint": "https://example.eks.amazonaws.com",
+                                "certificateAuthority": {"data": "Y2VydGlmaWNhdGU="}},
+}
+
+
+class BenchMocks(pulumi.runtime.Mocks):
+    """
+    Return canned results for invokes & echo resource inputs back as outputs. Counts invokes by token
+    """
+    def __init__(self):
+        self.invokes = collections.Counter()
+
+    def call(self, args):
+        self.invokes[args.token] += 1
+        return INVOKE_RESULTS.get(args.token, {})
+
+    def new_resource(self, args):
+        outputs = dict(args.inputs)
+        outputs.setdefault("arn", "arn:aws:mock:::%s" % args.name)
+        outputs.update(RESOURCE_OUTPUTS.get(args.typ, {}))
+        return "%s-id" % args.name, outputs
+
+
+class RecordingMonitor(MockMonitor):
+    """
+    Record every registration in order, with the URNs it depends on. Raises on duplicate URNs, as the engine would
+    """
+    def __init__(self, mocks):
+        MockMonitor.__init__(self, mocks)
+        self.registrations = []
+        self._urns = set()
+
+    def RegisterResource(self, request):
+        response = MockMonitor.RegisterResource(self, request)
+        if request.type != "pulumi:pulumi:Stack":
+            if response.urn in self._urns:
+                raise Exception("duplicate resource URN %s" % response.urn)
+            self._urns.add(response.urn)
+            self.registrations.append({
+                "urn": response.urn,
+                "type": request.type,
+                "name": request.name,
+                "parent": request.parent,
+                "custom": request.custom,
+                # every dependency, explicit or through an input, & those through each input
+                "dependencies": list(request.dependencies),
+                "property_dependencies": dict((key, list(deps.urns)) for key, deps in request.propertyDependencies.items()),
+                "provider": request.provider,
+                # the alias names, or their URNs when the engine works them out
+                "aliases": [alias.spec.name or alias.urn for alias in request.aliases] + list(request.aliasURNs),
+            })
+            Trace.registered(response.urn, request.parent)
+        return response
+
+
+def run(build, mocks=None):
+    """
+    Call build() against fresh mocks & wait until everything it declared has registered
+
+    :param build A function declaring resources
+    :param mocks The mocks to use. Defaults to a new BenchMocks
+    :return the RecordingMonitor holding the registrations
+    """
+    mocks = mocks or BenchMocks()
+    monitor = RecordingMonitor(mocks)
+
+    # each run starts from an empty stack & an empty in memory lookup cache
+    settings.set_root_resource(None)
+    Lookup.set_cache(LookupCache(mode="off"))
+    pulumi.runtime.set_mocks(mocks, preview=True, monitor=monitor)
+    _sync_await(run_pulumi_func(build))
+    return monitor
@@ -0,0 +1,3 @@
+"""
+Offline benchmarks for program construction, run against pulumi mocks
+"""
@@ -0,0 +1,41 @@
+import os
+import tracemalloc
+from unittest import TestCase, mock
+
+import bench.Construction as Construction
+import bench.Mocks as Mocks
+
+
+class TestConstruction(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        os.environ.setdefault("PAVE_WORKSTATION_IP", Mocks.WORKSTATION_IP)
+
+    def test_invokes_do_not_grow_with_servers(self):
+        small = Construction.measure("server", 1)
+        large = Construction.measure("server", 5)
+        self.assertEqual(small["invokes"], large["invokes"])
+        self.assertEqual(small["resources"] + 8, large["resources"])
+
+    def test_fleet_looks_up_the_ami_once(self):
+        result = Construction.measure("fleet", 5)
+        self.assertEqual(2, result["invokes"])
+
+    def test_timed_without_tracemalloc(self):
+        tracing = []
+        run = Mocks.run
+
+        def traced_run(build, mocks=None):
+            tracing.append(tracemalloc.is_tracing())
+            return run(build, mocks)
+        with mock.patch.object(Mocks, "run", traced_run):
+            result = Construction.measure("network", 1)
+        self.assertEqual([False, True], tracing)
+        self.assertGreater(result["peak_memory"], 0)
+
+    def test_compare_flags_growth(self):
+        before = [{"scenario": "server", "scale": 1, "wall_time": 1.0, "invokes": 2, "resources": 24, "peak_memory": 100}]
+        after = [dict(before[0], invokes=3, wall_time=2.0)]
+        self.assertEqual(2, len(Construction.compare(before, after)))
+        self.assertEqual([], Construction.compare(before, before))
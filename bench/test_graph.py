@@ -0,0 +1,49 @@
+import os
+from unittest import TestCase
+
+import bench.Graph as Graph
+import bench.Mocks as Mocks
+
+
+def registration(name, type="test:index:Thing", dependencies=None, inputs=None, parent="", custom=True):
+    return {"urn": name, "type": type, "name": name, "parent": parent, "custom": custom,
+            "dependencies": list(dependencies or []) + list(inputs or []), "property_dependencies": {"input": list(inputs or [])},
+            "provider": ""}
+
+
+class TestDeployGraph(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        os.environ.setdefault("PAVE_WORKSTATION_IP", Mocks.WORKSTATION_IP)
+
+    def test_critical_path_and_redundant_dependencies(self):
+        graph = Graph.DeployGraph([
+            registration("a"),
+            registration("b", inputs=["a"]),
+            registration("c", inputs=["b"], dependencies=["a"]),
+            registration("d", dependencies=["a"]),
+        ], latencies={"test:index:Thing": 10})
+        report = graph.report()
+        self.assertEqual(["a", "b", "c"], [step["urn"] for step in report["critical_path"]])
+        self.assertEqual(30, report["makespan"])
+        self.assertEqual(2, report["peak_parallelism"])
+        edges = dict(((e["resource"], e["dependency"]), e) for e in report["explicit_dependencies"])
+        self.assertTrue(edges[("c", "a")]["redundant"])
+        self.assertFalse(edges[("d", "a")]["redundant"])
+        self.assertEqual(0, edges[("d", "a")]["saving"])
+
+    def test_dependencies_on_a_component_wait_for_its_resources(self):
+        graph = Graph.DeployGraph([
+            registration("component", custom=False),
+            registration("inner", parent="component"),
+            registration("outer", dependencies=["component"]),
+        ])
+        self.assertEqual({"inner"}, graph.dependencies["outer"])
+        self.assertEqual(Graph.DEFAULT_LATENCY, graph.report()["explicit_dependencies"][0]["saving"])
+
+    def test_cluster_node_group_waits_on_the_control_plane(self):
+        report = Graph.analyse("cluster")
+        self.assertEqual("aws:eks/cluster:Cluster", report["critical_path"][-3]["type"])
+        redundant = [e for e in report["explicit_dependencies"] if e["redundant"]]
+        self.assertEqual(["cluster-0-asg"], [e["resource"].rsplit("::", 1)[-1] for e in redundant])
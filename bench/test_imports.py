@@ -0,0 +1,34 @@
+import types
+from unittest import TestCase
+
+import bench.Imports as Imports
+import util.Lazy as Lazy
+
+
+class TestImports(TestCase):
+
+    def test_packages_load_no_sdks(self):
+        for package in ("network", "compute", "util"):
+            self.assertEqual([], Imports.probe(package)["loaded"], package)
+
+    def test_components_load_only_what_they_use(self):
+        self.assertNotIn("pulumi_kubernetes", Imports.probe("compute.EKS")["loaded"])
+        self.assertEqual([], Imports.probe("util.Util")["loaded"])
+
+    def test_modules_stay_modules(self):
+        import compute.Server as Server
+        import network.Network as Network
+        from compute import Cluster
+        self.assertIsInstance(Server, types.ModuleType)
+        self.assertIsInstance(Network, types.ModuleType)
+        self.assertIsInstance(Cluster, type)
+
+    def test_exports_can_not_name_modules(self):
+        with self.assertRaises(ImportError):
+            Lazy.exports("compute", {"Server": "compute.Server"})
+
+    def test_compare_flags_new_modules(self):
+        before = [{"target": "compute.EKS", "import_time": 0.2, "loaded": ["pulumi_aws"]}]
+        after = [dict(before[0], loaded=["pulumi_aws", "pulumi_kubernetes"])]
+        self.assertEqual(["compute.EKS now imports pulumi_kubernetes"], Imports.compare(before, after))
+        self.assertEqual([], Imports.compare(before, before))
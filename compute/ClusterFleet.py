@@ -0,0 +1,46 @@
+from pulumi.errors import RunError
+from pulumi.resource import ComponentResource, ResourceOptions
+
+import util.Trace as Trace
+from compute.EKS import Cluster, ClusterRoles
+
+
+class ClusterFleet(ComponentResource):
+    """
+    Create count EKS clusters that share one set of IAM roles. Every other resource is namespaced by its cluster's name,
+    so clusters named name-0, name-1, ... sit side by side in the stack. Names are stable, so growing the fleet only
+    adds clusters.
+
+    :param name The name of the fleet. Clusters are named name-<index> & the shared roles name-master-role & name-worker-role
+    :param count The number of clusters to create
+    :param overrides A dictionary of cluster index to a dictionary of Cluster arguments to use for that cluster only,
+           e.g. {0: {"subnet_ids": other_subnets}}
+    :param opts ResourceOptions for the component, e.g. a parent
+    :param cluster_args Cluster arguments shared by every cluster, e.g. node_count, vpc_id, subnet_ids & version
+    """
+    @Trace.component
+    def __init__(self, name, count=1, overrides=None, opts=None, **cluster_args):
+        ComponentResource.__init__(self, "aws:compute:eksfleet", name, None, opts)
+
+        overrides = overrides or {}
+        unknown = [index for index in overrides if index < 0 or index >= count]
+        if unknown:
+            raise RunError("overrides given for clusters that are not in the fleet: %s" % unknown)
+        if "roles" in cluster_args:
+            raise RunError("a ClusterFleet creates the roles its clusters share")
+
+        self.name = name
+        self.count = count
+        self.roles = ClusterRoles(name, opts=ResourceOptions(parent=self))
+
+        self.clusters = []
+        for index in range(count):
+            args = dict(cluster_args)
+            args.update(overrides.get(index, {}))
+            self.clusters.append(Cluster("%s-%d" % (name, index), roles=self.roles, opts=ResourceOptions(parent=self), **args))
+
+        self.cluster_cas = [cluster.cluster_ca for cluster in self.clusters]
+
+        self.register_outputs({
+            "cluster_names": [cluster.name for cluster in self.clusters]
+        })
@@ -0,0 +1,119 @@
+"""
+Configure the Amazon VPC CNI of an EKS cluster & work out the pods its nodes can run
+"""
+import json
+
+from pulumi import Output
+from pulumi.errors import RunError
+
+import util.Lookup as Lookup
+
+CNI_MODES = ("prefix_delegation", "custom_networking")
+
+# each prefix delegated to an ENI slot is a /28, i.e. 16 addresses
+ADDRESSES_PER_PREFIX = 16
+# the kubelet's recommended ceilings, as used by the EKS max pods calculator
+MAX_PODS_SMALL = 110
+MAX_PODS_LARGE = 250
+LARGE_INSTANCE_VCPUS = 30
+
+ENI_CONFIG_LABEL = "topology.kubernetes.io/zone"
+
+ENI_CONFIG_TEMPLATE = """apiVersion: crd.k8s.amazonaws.com/v1alpha1
+kind: ENIConfig
+metadata:
+  name: %(zone)s
+spec:
+  securityGroups:
+    - %(security_group_id)s
+  subnet: %(subnet_id)s
+"""
+
+
+class VpcCni(object):
+    """
+    Settings for the vpc-cni addon. Prefix delegation gives each ENI slot a /28 instead of one address, so a node runs
+    far more pods for the same ENIs. Custom networking takes pod addresses from pod_subnets, e.g. subnets in a
+    100.64.0.0/10 secondary CIDR block, instead of the node's subnet. Both can be on at once.
+
+    :param prefix_delegation Assign /28 prefixes to the ENIs. Needs Nitro instance types
+    :param custom_networking Place pods in pod_subnets
+    :param pod_subnets A dictionary of availability zone name to the subnet id pods in that zone use, e.g.
+           {"us-east-1a": subnet_id} or the pod_subnets of a Network. Required with custom_networking
+    :param warm_prefix_target The amount of spare prefixes each node keeps attached
+    :param warm_ip_target The amount of spare addresses each node keeps. Overrides warm_prefix_target
+    :param max_pods_cap The ceiling for the computed max pods. Defaults to 110, or 250 with 30 or more vcpus
+    :param addon_version The vpc-cni addon version. Defaults to the cluster version's default
+    :param env A dictionary of any other aws-node environment variables
+    """
+    def __init__(self, prefix_delegation=True, custom_networking=False, pod_subnets=None, warm_prefix_target=1,
+                 warm_ip_target=None, max_pods_cap=None, addon_version=None, env=None):
+        if custom_networking and not pod_subnets:
+            raise RunError("custom networking needs the pod subnet of each availability zone")
+        self.prefix_delegation = prefix_delegation
+        self.custom_networking = custom_networking
+        self.pod_subnets = pod_subnets or {}
+        self.warm_prefix_target = warm_prefix_target
+        self.warm_ip_target = warm_ip_target
+        self.max_pods_cap = max_pods_cap
+        self.addon_version = addon_version
+        self.env = env or {}
+
+    def addon_env(self):
+        """
+        Return the aws-node environment variables
+        """
+        env = {}
+        if self.prefix_delegation:
+            env["ENABLE_PREFIX_DELEGATION"] = "true"
+            if self.warm_ip_target is not None:
+                env["WARM_IP_TARGET"] = str(self.warm_ip_target)
+            else:
+                env["WARM_PREFIX_TARGET"] = str(self.warm_prefix_target)
+        if self.custom_networking:
+            env["AWS_VPC_K8S_CNI_CUSTOM_NETWORK_CFG"] = "true"
+            env["ENI_CONFIG_LABEL_DEF"] = ENI_CONFIG_LABEL
+        env.update(self.env)
+        return env
+
+    def configuration_values(self):
+        return json.dumps({"env": self.addon_env()}, sort_keys=True)
+
+    def max_pods(self, instance_types):
+        """
+        Return the most pods every one of instance_types can run, as the EKS max pods calculator works it out
+
+        :param instance_types A list of instance types, e.g. ["m5.large", "m5a.large"]
+        """
+        return min(self._max_pods(instance_type) for instance_type in instance_types)
+
+    def _max_pods(self, instance_type):
+        limits = Lookup.get_instance_type(instance_type)
+        if self.prefix_delegation and limits["hypervisor"] != "nitro":
+            raise RunError("prefix delegation needs Nitro instance types. %s is not one" % instance_type)
+
+        enis = limits["maximum_network_interfaces"]
+        # the primary ENI keeps to the node's subnet with custom networking, so it holds no pods
+        if self.custom_networking:
+            enis -= 1
+        # one address per ENI is the ENI's own
+        slots = enis * (limits["maximum_ipv4_addresses_per_interface"] - 1)
+        if self.prefix_delegation:
+            slots *= ADDRESSES_PER_PREFIX
+        # plus aws-node & kube-proxy, which use the host network
+        max_pods = slots + 2
+
+        cap = self.max_pods_cap
+        if cap is None:
+            cap = MAX_PODS_LARGE if limits["default_vcpus"] >= LARGE_INSTANCE_VCPUS else MAX_PODS_SMALL
+        return min(max_pods, cap)
+
+    def eni_configs(self, security_group_id):
+        """
+        Return an Output of the ENIConfig manifests for custom networking, one per availability zone. Apply them with
+        kubectl before nodes join: this repo does not manage kubernetes objects
+        """
+        zones = sorted(self.pod_subnets)
+        return Output.all(security_group_id, *[self.pod_subnets[zone] for zone in zones]).apply(
+            lambda args: "---\n".join(ENI_CONFIG_TEMPLATE % {"zone": zone, "security_group_id": args[0], "subnet_id": subnet_id}
+                                      for zone, subnet_id in zip(zones, args[1:])))
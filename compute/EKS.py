@@ -1,27 +1,83 @@
-from pulumi.resource import ComponentResource, ResourceOptions
-import pulumi_aws
+import base64
+import copy
+
+from pulumi.resource import Alias, ComponentResource, ResourceOptions
 from pulumi_aws import eks
 from pulumi_aws import iam
 from pulumi_aws import ec2
 from pulumi_aws import autoscaling
-from pulumi_kubernetes.core.v1 import ConfigMap
-from pulumi_kubernetes import Provider
 from pulumi import Output
+from pulumi.errors import RunError
 
 import util.Util as Util
+import util.Lookup as Lookup
+import util.Trace as Trace
+from network.SecurityGroups import RuleSet
+from compute.UserData import NodeUserData
+
+MASTER_POLICIES = ["AmazonEKSClusterPolicy", "AmazonEKSServicePolicy"]
+# the states whose instances reboot on leaving the pool, which is when they join the cluster
+WARM_POOL_STATES = ("Stopped", "Hibernated")
+WORKER_POLICIES = ["AmazonEKSWorkerNodePolicy", "AmazonEKS_CNI_Policy", "AmazonEC2ContainerRegistryReadOnly"]
 
 
 class Cluster(ComponentResource):
     """
-    Create an EKS cluster with x nodes
+    Create an EKS cluster with x nodes. The nodes are launched from a launch template by one autoscaling group, or one per
+    subnet with node_group_per_az. Several instance types & spot instances can be mixed, and a warm pool of stopped,
+    pre-initialised instances can be kept to cut scale out time. A warm pool needs a single, on demand instance type.
+
+    :param name The name of the cluster
+    :param instance_type The instance type of the nodes
+    :param node_count The desired amount of nodes, split across the groups with node_group_per_az
+    :param version The kubernetes version, e.g. 1.29. The nodes launch from the EKS AMI of that version. Required
+    :param instance_types A list of instance types to mix, in order of preference. Overrides instance_type
+    :param min_size The minimum amount of nodes. Defaults to node_count
+    :param max_size The maximum amount of nodes. Defaults to node_count
+    :param on_demand_base_capacity The amount of nodes that are always on demand
+    :param on_demand_percentage The percentage of nodes above the base capacity that are on demand. The rest are spot
+    :param spot_allocation_strategy How spot instances are picked from the instance types
+    :param node_group_per_az Create an autoscaling group per subnet rather than one spanning them all
+    :param warm_pool A dictionary of warm pool settings - min_size, max_group_prepared_capacity, pool_state (Stopped or
+           Hibernated) & reuse_on_scale_in. Instances in the pool wait to join the cluster until they are used. Not
+           supported with several instance types or spot instances
+    :param user_data A NodeUserData with kubelet tuning for the nodes. Boot phase timings are logged on every node
+    :param cni A VpcCni to configure the vpc-cni addon with, e.g. for prefix delegation. Unless user_data sets max_pods,
+           the nodes get the max pods the CNI mode allows on the smallest of the instance types
+    :param roles The ClusterRoles to use, e.g. shared with other clusters. Defaults to creating them for this cluster
+    :param opts ResourceOptions for the component, e.g. a parent
     """
 
+    @Trace.component
     def __init__(self, name, instance_type="t2.micro", node_count=0, vpc_id=None, key_name=None, subnet_ids=None,
-                 version=None, bastion_sg_id=None, asg_tags=None):
-        ComponentResource.__init__(self, "aws:compute:eks", name, None, None)
+                 version=None, bastion_sg_id=None, asg_tags=None, instance_types=None, min_size=None, max_size=None,
+                 on_demand_base_capacity=0, on_demand_percentage=100, spot_allocation_strategy="price-capacity-optimized",
+                 node_group_per_az=False, warm_pool=None, user_data=None, cni=None, roles=None, opts=None):
+        ComponentResource.__init__(self, "aws:compute:eks", name, None, opts)
+        if version is None:
+            raise RunError("a Cluster needs a kubernetes version, e.g. 1.29")
+        self.name = name
         self.vpc_id = vpc_id
+        self.instance_types = instance_types or [instance_type]
+        self.warm_pool = warm_pool
+        if warm_pool is not None:
+            # AWS rejects warm pools on groups with a mixed instances policy
+            if len(self.instance_types) > 1 or on_demand_percentage < 100:
+                raise RunError("a warm pool cannot be used with several instance types or spot instances")
+            # a Running pool instance goes into service without a reboot, so the per boot bootstrap would never run
+            if warm_pool.get("pool_state", "Stopped") not in WARM_POOL_STATES:
+                raise RunError("Unsupported warm pool state %s! One of %s supported"
+                               % (warm_pool["pool_state"], ", ".join(WARM_POOL_STATES)))
+        # copied, as the same settings may be shared by several clusters
+        self.node_user_data = copy.copy(user_data) if user_data is not None else NodeUserData()
+        if warm_pool is not None:
+            self.node_user_data.warm_pool = True
 
-        self._create_compute_iam_roles(name)
+        self.roles = roles if roles is not None else ClusterRoles(name, opts=ResourceOptions(parent=self))
+        self.eks_master_role = self.roles.master_role_arn
+        self.eks_worker_role = self.roles.worker_role
+        self.eks_worker_instance_profile = self.roles.instance_profile_name
+        self.cluster_role_attachment_dependencies = self.roles.master_attachments
         self._create_sgs(bastion_sg_id)
 
         vpc_config = {
@@ -33,26 +89,73 @@ class Cluster(ComponentResource):
             "Name": name
         }
         cluster = eks.Cluster(name, name=name, role_arn=self.eks_master_role, tags=eks_tags, vpc_config=vpc_config,
-                             __opts__=ResourceOptions(parent=self, depends_on=self.cluster_role_attachment_dependencies))
+                             opts=ResourceOptions(parent=self, depends_on=self.cluster_role_attachment_dependencies))
 
         eks_ami = _get_eks_ami(version)
 
+        # nodes have to start with the CNI configured, or their ENIs cannot hold max pods addresses
+        node_dependencies = [cluster]
+        self.cni_addon = None
+        self.eni_configs = None
+        if cni is not None:
+            if self.node_user_data.max_pods is None:
+                self.node_user_data.max_pods = cni.max_pods(self.instance_types)
+            self.cni_addon = eks.Addon("%s-vpc-cni" % name, cluster_name=cluster.name, addon_name="vpc-cni",
+                                       addon_version=cni.addon_version, configuration_values=cni.configuration_values(),
+                                       resolve_conflicts_on_create="OVERWRITE", resolve_conflicts_on_update="OVERWRITE",
+                                       opts=ResourceOptions(parent=self))
+            node_dependencies.append(self.cni_addon)
+            if cni.custom_networking:
+                self.eni_configs = cni.eni_configs(self.worker_sg)
+
         user_data = self._build_asg_userdata(cluster, name)
-        node_launch_config = ec2.LaunchConfiguration("%s-launch-config" % name, image_id=eks_ami, instance_type=instance_type,
-                                                     iam_instance_profile=self.eks_worker_instance_profile, key_name=key_name,
-                                                     name=name, security_groups=[self.worker_sg],
-                                                     user_data=user_data,
-                                                     __opts__=ResourceOptions(parent=self))
+        # the instance type goes on the template unless the autoscaling group picks from several
+        node_launch_template = ec2.LaunchTemplate("%s-launch-template" % name, name=name, image_id=eks_ami,
+                                                  instance_type=self.instance_types[0] if len(self.instance_types) == 1 else None,
+                                                  iam_instance_profile={"name": self.eks_worker_instance_profile}, key_name=key_name,
+                                                  vpc_security_group_ids=[self.worker_sg],
+                                                  user_data=user_data.apply(lambda u: base64.b64encode(u.encode()).decode()),
+                                                  update_default_version=True, opts=ResourceOptions(parent=self))
         asg_tags = {
             "key": "kubernetes.io/cluster/%s" % name,
             "value": "owned",
-            "propagateAtLaunch": True
+            "propagate_at_launch": True
         }
-        node_asg = autoscaling.Group("%s-asg" % name, launch_configuration=node_launch_config.id, max_size=node_count,
-                                     min_size=node_count, desired_capacity=node_count, vpc_zone_identifiers=subnet_ids,
-                                     tags=[asg_tags], __opts__=ResourceOptions(parent=self, depends_on=[cluster]))
 
-        # # TODO: create configmap to join the nodes to cluster
+        spot = on_demand_percentage < 100
+        launch_template = {"id": node_launch_template.id, "version": "$Latest"}
+        mixed_instances_policy = None
+        if len(self.instance_types) > 1 or spot:
+            launch_template = None
+            mixed_instances_policy = {
+                "launch_template": {
+                    "launch_template_specification": {"launch_template_id": node_launch_template.id, "version": "$Latest"},
+                    "overrides": [{"instance_type": t} for t in self.instance_types]
+                },
+                "instances_distribution": {
+                    "on_demand_base_capacity": on_demand_base_capacity,
+                    "on_demand_percentage_above_base_capacity": on_demand_percentage,
+                    "spot_allocation_strategy": spot_allocation_strategy
+                }
+            }
+
+        min_size = node_count if min_size is None else min_size
+        max_size = node_count if max_size is None else max_size
+        groups = [(None, subnet_ids)]
+        if node_group_per_az:
+            groups = [(i, [subnet_id]) for i, subnet_id in enumerate(subnet_ids)]
+
+        self.node_groups = []
+        for i, group_subnet_ids in groups:
+            asg_name = "%s-asg" % name if i is None else "%s-asg-%d" % (name, i)
+            node_asg = autoscaling.Group(asg_name, launch_template=launch_template, mixed_instances_policy=mixed_instances_policy,
+                                         max_size=_split(max_size, len(groups), i), min_size=_split(min_size, len(groups), i),
+                                         desired_capacity=_split(node_count, len(groups), i), vpc_zone_identifiers=group_subnet_ids,
+                                         capacity_rebalance=spot, warm_pool=_warm_pool_args(warm_pool), tags=[asg_tags],
+                                         opts=ResourceOptions(parent=self, depends_on=node_dependencies))
+            self.node_groups.append(node_asg)
+
+        # # TODO: create configmap to join the nodes to cluster. Needs ConfigMap & Provider from pulumi_kubernetes
         # configmap_data = {
         #     "mapRoles" : [{
         #         "rolearn":self.eks_worker_role.arn,
@@ -70,24 +173,65 @@ class Cluster(ComponentResource):
         #
         # k8s_provider = Provider("dtd-cluster", kubeconfig=cluster.certificate_authority)
         # join_nodes = ConfigMap("join-nodes-cm", data=configmap_data, metadata=configmap_metadata,
-        #                        __opts__=ResourceOptions(parent=self, provider=k8s_provider))
+        #                        opts=ResourceOptions(parent=self, provider=k8s_provider))
 
         self.cluster_ca = cluster.certificate_authority['data']
 
     def _build_asg_userdata(self, cluster, name):
-        user_data = Output.all(cluster.endpoint, cluster.certificate_authority).apply(lambda args: """
-#!/bin/bash
-set -o xtrace
-/etc/eks/bootstrap.sh --apiserver-endpoint %s --b64-cluster-ca %s %s
-""" % (args[0], args[1]['data'], name))
-
-        print(user_data)
-        return user_data
+        return Output.all(cluster.endpoint, cluster.certificate_authority).apply(
+            lambda args: self.node_user_data.render(args[0], args[1]['data'], name))
 
     def _build_kube_config(self, ca):
         pass
 
-    def _create_compute_iam_roles(self, name):
+    def _create_sgs(self, bastion_id=None):
+        #TODO: if infra left up for a while, security groups cant be deleted. are they modified when running? Need a tag?
+
+        # the groups & rules keep the names they had before they were namespaced, so existing stacks do not replace them
+        rules = RuleSet(self.vpc_id, parent=self)
+        rules.group("master", "%s-master-sg" % self.name, description="security group for communication with the eks master plance",
+                    alias="master-sg")
+        rules.group("worker", "%s-worker-sg" % self.name, description="security group for communication with the worker nodes",
+                    alias="worker-sg")
+
+        # Create the egress/ingress rules for the master
+        rules.egress("master", cidr_blocks=["0.0.0.0/0"], description="master sg egress", alias="master-sg-egress")
+        current_ip = Util.get_workstation_ip()
+        rules.ingress("master", protocol="tcp", from_port=443, to_port=443, cidr_blocks=["%s/32" % current_ip],
+                      description="ingress to masters from workstation", alias="master-sg-ingress-from-workstation")
+        rules.ingress("master", source="worker", description="master ingress from workers",
+                      alias="master-sg-ingress-from-workers")
+
+        # Create the egress/ingress rules for the workers
+        rules.egress("worker", cidr_blocks=["0.0.0.0/0"], description="worker sg egress", alias="worker-sg-egress")
+        rules.ingress("worker", itself=True, description="worker ingress from itself", alias="worker-sg-ingress-itself")
+        rules.ingress("worker", source="master", description="worker ingress from master", alias="worker-sg-ingress-master")
+        if bastion_id is not None:
+            rules.ingress("worker", source_security_group_id=bastion_id, name="bastion",
+                          description="worker ingress from bastion host", alias="worker-sg-ingress-bastion")
+
+        self.security_group_rules = rules
+        security_group_ids = rules.build()
+        self.master_sg = security_group_ids["master"]
+        self.worker_sg = security_group_ids["worker"]
+
+
+class ClusterRoles(ComponentResource):
+    """
+    Create the IAM roles EKS clusters need, with their policies attached, & the worker instance profile. Pass one to
+    several clusters to share the roles between them rather than creating a set per cluster.
+
+    :param name The name of the roles. They are named name-master-role & name-worker-role
+    :param opts ResourceOptions for the component, e.g. a parent
+    """
+
+    def __init__(self, name, opts=None):
+        ComponentResource.__init__(self, "aws:compute:eksroles", name, None, opts)
+        # the roles of a single cluster used to be created by the cluster itself. Their IAM names are fixed, so they
+        # keep their old resource names - a replacement would fail as the names are taken
+        parent = opts.parent if opts is not None else None
+        self._cluster = parent if isinstance(parent, Cluster) else None
+
         # According to AWS docs, this trust policy is required for the masters & the agents
         # TODO: can we curl for this & check if its different? use the updated one & log if different.
         # Note: multi line string requires open bracket here. Adding a newline results in a malformed policy doc
@@ -119,73 +263,58 @@ set -o xtrace
 
         policy_arn_string = "arn:aws:iam::aws:policy/"
 
-        eks_master_role = iam.Role("eks-service-role", name="%s-master-role" % name, description="role for eks service", assume_role_policy=mrp,
-                                   __opts__=ResourceOptions(parent=self))
-        eks_worker_role = iam.Role("eks-service-worker-role", name="%s-worker-role" % name, description="role for eks worker nodes", assume_role_policy=wrp,
-                                   __opts__=ResourceOptions(parent=self))
-        eks_worker_instance_profile = iam.InstanceProfile("eks_worker_instance_profile", name="%s-instance-profile" % name,
-                                                          role=eks_worker_role.id, __opts__=ResourceOptions(parent=self))
-
-        # attach required policies to the master plane
-        d1 = iam.PolicyAttachment("policy-AmazonEKSClusterPolicy", policy_arn="%sAmazonEKSClusterPolicy" % policy_arn_string, roles=[eks_master_role.id],
-                             __opts__=ResourceOptions(parent=self))
-        d2 = iam.PolicyAttachment("policy-AmazonEKSServicePolicy", policy_arn="%sAmazonEKSServicePolicy" % policy_arn_string, roles=[eks_master_role.id],
-                             __opts__=ResourceOptions(parent=self))
-
-        # attach required policies to the worker nodes
-        iam.PolicyAttachment("policy-AmazonEKSWorkerNodePolicy", policy_arn="%sAmazonEKSWorkerNodePolicy" % policy_arn_string, roles=[eks_worker_role.id],
-                             __opts__=ResourceOptions(parent=self))
-        iam.PolicyAttachment("policy-AmazonEKS_CNI_Policy", policy_arn="%sAmazonEKS_CNI_Policy" % policy_arn_string, roles=[eks_worker_role.id],
-                             __opts__=ResourceOptions(parent=self))
-        iam.PolicyAttachment("policy-AmazonEC2ContainerRegistryReadOnly", policy_arn="%sAmazonEC2ContainerRegistryReadOnly" % policy_arn_string, roles=[eks_worker_role.id],
-                             __opts__=ResourceOptions(parent=self))
-
-        self.eks_master_role = eks_master_role.arn
-        self.eks_worker_role = eks_worker_role
-        self.cluster_role_attachment_dependencies = [d1, d2]
-        self.eks_worker_instance_profile = eks_worker_instance_profile.name
+        eks_master_role = iam.Role("%s-eks-service-role" % name, name="%s-master-role" % name, description="role for eks service",
+                                   assume_role_policy=mrp, opts=self._opts("eks-service-role"))
+        eks_worker_role = iam.Role("%s-eks-service-worker-role" % name, name="%s-worker-role" % name,
+                                   description="role for eks worker nodes", assume_role_policy=wrp,
+                                   opts=self._opts("eks-service-worker-role"))
+        eks_worker_instance_profile = iam.InstanceProfile("%s-eks-worker-instance-profile" % name, name="%s-instance-profile" % name,
+                                                          role=eks_worker_role.id, opts=self._opts("eks_worker_instance_profile"))
 
-    def _create_sgs(self, bastion_id=None):
-        #TODO: if infra left up for a while, security groups cant be deleted. are they modified when running? Need a tag?
+        # attach required policies to the master plane & the worker nodes. A PolicyAttachment owns every attachment of
+        # its policy in the account, so two sets of roles would detach each other's - a RolePolicyAttachment only its own
+        self.master_attachments = [self._attach(name, policy_arn_string, policy, eks_master_role)
+                                   for policy in MASTER_POLICIES]
+        self.worker_attachments = [self._attach(name, policy_arn_string, policy, eks_worker_role)
+                                   for policy in WORKER_POLICIES]
 
-        # Create the security groups first
-        master_sg = ec2.SecurityGroup("master-sg", vpc_id=self.vpc_id, description="security group for communication with the eks master plance",
-                                      __opts__=ResourceOptions(parent=self))
-        worker_sg = ec2.SecurityGroup("worker-sg", vpc_id=self.vpc_id, description="security group for communication with the worker nodes",
-                                      __opts__=ResourceOptions(parent=self))
+        self.master_role_arn = eks_master_role.arn
+        self.worker_role = eks_worker_role
+        self.instance_profile_name = eks_worker_instance_profile.name
 
-        # Create the egress/ingress rules for the master
-        master_sg_egress = ec2.SecurityGroupRule("master-sg-egress", type="egress", cidr_blocks=["0.0.0.0/0"], from_port=0,
-                                                 to_port=0, protocol=-1, security_group_id=master_sg.id, description="master sg egress",
-                                                 __opts__=ResourceOptions(parent=self))
-        current_ip = Util.get_workstation_ip()
-        master_sg_ingress_workstation = ec2.SecurityGroupRule("master-sg-ingress-from-workstation", type="ingress", from_port=443, to_port=443,
-                                                              protocol=-1, security_group_id=master_sg.id, cidr_blocks=["%s/32" % current_ip],
-                                                              description="ingress to masters from workstation", __opts__=ResourceOptions(parent=self))
-        master_sg_ingress_nodes = ec2.SecurityGroupRule("master-sg-ingress-from-workers", type="ingress", from_port=0, to_port=0,
-                                                        protocol=-1, security_group_id=master_sg.id, source_security_group_id=worker_sg.id,
-                                                        description="master ingress from workers", __opts__=ResourceOptions(parent=self))
+        self.register_outputs({
+            "master_role_arn": self.master_role_arn,
+            "worker_role_arn": eks_worker_role.arn,
+            "instance_profile_name": self.instance_profile_name
+        })
+
+    def _opts(self, old_name):
+        if self._cluster is None:
+            return ResourceOptions(parent=self)
+        return ResourceOptions(parent=self, aliases=[Alias(name=old_name, parent=self._cluster)])
+
+    def _attach(self, name, policy_arn_string, policy, role):
+        return iam.RolePolicyAttachment("%s-policy-%s" % (name, policy), policy_arn="%s%s" % (policy_arn_string, policy),
+                                        role=role.id, opts=ResourceOptions(parent=self))
+
+
+def _split(total, parts, index):
+    # spread total across parts, the first groups taking the remainder
+    if index is None:
+        return total
+    return total // parts + (1 if index < total % parts else 0)
+
+
+def _warm_pool_args(warm_pool):
+    if warm_pool is None:
+        return None
+    return {
+        "min_size": warm_pool.get("min_size", 0),
+        "max_group_prepared_capacity": warm_pool.get("max_group_prepared_capacity"),
+        "pool_state": warm_pool.get("pool_state", "Stopped"),
+        "instance_reuse_policy": {"reuse_on_scale_in": warm_pool.get("reuse_on_scale_in", True)}
+    }
 
-        # Create the egress/ingress rules for the workers
-        worker_sg_egress = ec2.SecurityGroupRule("worker-sg-egress", type="egress", cidr_blocks=["0.0.0.0/0"], from_port=0,
-                                             to_port=0, protocol=-1, security_group_id=worker_sg.id, description="worker sg egress",
-                                             __opts__=ResourceOptions(parent=self))
-        worker_sg_ingress_itself = ec2.SecurityGroupRule("worker-sg-ingress-itself", type="ingress", from_port=0, to_port=0,
-                                                         protocol=-1, security_group_id=worker_sg.id, self=True, description="worker ingress from itself",
-                                                         __opts__=ResourceOptions(parent=self))
-        worker_sg_ingress_master = ec2.SecurityGroupRule("worker-sg-ingress-master", type="ingress", from_port=0, to_port=0,
-                                                         protocol=-1, security_group_id=worker_sg.id, source_security_group_id=master_sg.id,
-                                                         description="worker ingress from master", __opts__=ResourceOptions(parent=self))
-        worker_sg_ingress_bastion = ec2.SecurityGroupRule("worker-sg-ingress-bastion", type="ingress", from_port=0, to_port=0,
-                                                          protocol=-1, security_group_id=worker_sg.id, source_security_group_id=bastion_id,
-                                                          description="worker ingress from bastion host", __opts__=ResourceOptions(parent=self))
-
-        self.master_sg = master_sg.id
-        self.worker_sg = worker_sg.id
 
 def _get_eks_ami(version):
-    # remove the Patch from the version - its not used in AMI ids
-    major_minor = ".".join(version.split('.')[:2])
-    eks_node_version = "amazon-eks-node-%s-v*" % major_minor
-    ami = pulumi_aws.get_ami(most_recent=True, owners=["amazon"], filters=[{"name": "name", "values" :[eks_node_version]}])
-    return ami.id
+    return Lookup.get_ami_id(Lookup.eks_node_ami_filter(version))
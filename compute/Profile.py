@@ -0,0 +1,147 @@
+"""
+Placement, storage, networking & cpu settings for latency sensitive instances
+"""
+from pulumi.errors import RunError
+from pulumi.resource import ResourceOptions
+import pulumi_aws as aws
+
+import util.Lookup as Lookup
+
+PLACEMENT_STRATEGIES = ("cluster", "partition", "spread")
+# volume types whose iops can be set, & those whose throughput can
+IOPS_VOLUME_TYPES = ("gp3", "io1", "io2")
+THROUGHPUT_VOLUME_TYPES = ("gp3",)
+# instance families that can not be EBS optimised, & those that can not launch into a cluster placement group
+EBS_UNOPTIMIZED_FAMILIES = ("t1", "t2")
+CLUSTER_UNSUPPORTED_FAMILIES = ("t1", "t2", "t3", "t3a", "t4g", "mac1", "mac2")
+
+
+class PerformanceProfile(object):
+    """
+    Settings for Server & ServerFleet instances that need low latency or high throughput. A placement strategy
+    creates one placement group for the server, or for the whole fleet.
+
+    :param placement_strategy cluster to pack instances close together, partition to keep groups of them on separate
+           racks or spread to put each on its own rack. Creates a placement group
+    :param placement_group The name of an existing placement group to launch into, instead of a placement strategy
+    :param partition_count The amount of partitions of a partition placement group
+    :param partition_number The partition to launch into. Defaults to letting EC2 spread the instances
+    :param spread_level rack, or host on Outposts, for a spread placement group
+    :param volume_type The type of the root volume, e.g. gp3
+    :param volume_size The size of the root volume in GiB. Defaults to the AMI's
+    :param iops The provisioned IOPS of a gp3, io1 or io2 root volume
+    :param throughput The throughput of a gp3 root volume in MiB/s
+    :param ebs_optimized Give EBS traffic its own bandwidth. Defaults to the instance type's default - current instance
+           types are EBS optimised regardless
+    :param ena Launch from an AMI with ENA, for enhanced networking
+    :param ami_filter The AMI name filter. Defaults to Amazon Linux 2023 with ena, for the architecture of the instance
+           type - x86_64 or arm64 for Graviton - otherwise the Server default
+    :param cpu_core_count The amount of cpu cores
+    :param threads_per_core 1 to turn hyperthreading off
+    """
+    def __init__(self, placement_strategy=None, placement_group=None, partition_count=None, partition_number=None,
+                 spread_level=None, volume_type="gp3", volume_size=None, iops=None, throughput=None, ebs_optimized=None,
+                 ena=True, ami_filter=None, cpu_core_count=None, threads_per_core=None):
+        if placement_strategy is not None and placement_strategy not in PLACEMENT_STRATEGIES:
+            raise RunError("Unsupported placement strategy %s! One of %s supported"
+                           % (placement_strategy, ", ".join(PLACEMENT_STRATEGIES)))
+        if placement_strategy is not None and placement_group is not None:
+            raise RunError("give either a placement strategy or an existing placement group, not both")
+        if (partition_count is not None or partition_number is not None) and placement_strategy != "partition":
+            raise RunError("partitions are only supported with the partition placement strategy")
+        if spread_level is not None and placement_strategy != "spread":
+            raise RunError("spread_level is only supported with the spread placement strategy")
+        if iops is not None and volume_type not in IOPS_VOLUME_TYPES:
+            raise RunError("iops are only supported for %s volumes. %s entered" % (", ".join(IOPS_VOLUME_TYPES), volume_type))
+        if throughput is not None and volume_type not in THROUGHPUT_VOLUME_TYPES:
+            raise RunError("throughput is only supported for %s volumes. %s entered"
+                           % (", ".join(THROUGHPUT_VOLUME_TYPES), volume_type))
+
+        self.placement_strategy = placement_strategy
+        self.placement_group = placement_group
+        self.partition_count = partition_count
+        self.partition_number = partition_number
+        self.spread_level = spread_level
+        self.volume_type = volume_type
+        self.volume_size = volume_size
+        self.iops = iops
+        self.throughput = throughput
+        self.ebs_optimized = ebs_optimized
+        self.ena = ena
+        self.ami_filter = ami_filter
+        self.cpu_core_count = cpu_core_count
+        self.threads_per_core = threads_per_core
+
+    def validate(self, instance_type):
+        """
+        Raise a RunError when the instance type does not support the placement strategy or EBS optimisation
+
+        :param instance_type The instance type, e.g. c5n.large
+        """
+        family = instance_type.split(".")[0]
+        if self.ebs_optimized and family in EBS_UNOPTIMIZED_FAMILIES:
+            raise RunError("Unsupported instance type for EBS optimisation! %s entered" % instance_type)
+        if self.placement_strategy == "cluster" and family in CLUSTER_UNSUPPORTED_FAMILIES:
+            raise RunError("Unsupported instance type for a cluster placement group! %s entered" % instance_type)
+
+    def ami_id(self, *instance_types):
+        """
+        Return the id of the AMI to launch. None leaves the choice to the Server default
+
+        :param instance_types The instance types launched from the AMI, to pick its architecture
+        """
+        if not self.ena:
+            return Lookup.get_ami_id(self.ami_filter) if self.ami_filter is not None else None
+        name_filter = self.ami_filter or Lookup.AMAZON_LINUX_2023_AMIS[self.architecture(instance_types)]
+        return Lookup.get_ami_id(name_filter, filters={"ena-support": ["true"]})
+
+    def architecture(self, instance_types):
+        """
+        Return the architecture the instance types share, x86_64 or arm64. x86_64 is preferred when both are supported
+
+        :param instance_types A list of instance types, e.g. [c7g.large]
+        """
+        shared = set(Lookup.AMAZON_LINUX_2023_AMIS)
+        for instance_type in instance_types:
+            shared &= set(Lookup.get_instance_type(instance_type)["supported_architectures"])
+        if not instance_types or not shared:
+            raise RunError("Unsupported instance types %s! They need to share the x86_64 or arm64 architecture"
+                           % ", ".join(instance_types))
+        return "x86_64" if "x86_64" in shared else "arm64"
+
+    def create_placement_group(self, name, parent):
+        """
+        Return the name of the placement group to launch into, creating it when there is a placement strategy
+
+        :param name The name of the server or fleet. The placement group is named name-pg
+        :param parent The resource to create the placement group under
+        """
+        if self.placement_strategy is None:
+            return self.placement_group
+        placement_group = aws.ec2.PlacementGroup("%s-pg" % name, strategy=self.placement_strategy,
+                                                 partition_count=self.partition_count, spread_level=self.spread_level,
+                                                 opts=ResourceOptions(parent=parent))
+        return placement_group.name
+
+    def instance_args(self):
+        """
+        Return the ec2.Instance arguments for the root volume, EBS optimisation, cpu options & partition
+        """
+        root_block_device = {"volume_type": self.volume_type}
+        for setting in ("volume_size", "iops", "throughput"):
+            if getattr(self, setting) is not None:
+                root_block_device[setting] = getattr(self, setting)
+
+        args = {"root_block_device": root_block_device}
+        if self.ebs_optimized is not None:
+            args["ebs_optimized"] = self.ebs_optimized
+        cpu_options = {}
+        if self.cpu_core_count is not None:
+            cpu_options["core_count"] = self.cpu_core_count
+        if self.threads_per_core is not None:
+            cpu_options["threads_per_core"] = self.threads_per_core
+        if cpu_options:
+            args["cpu_options"] = cpu_options
+        if self.partition_number is not None:
+            args["placement_partition_number"] = self.partition_number
+        return args
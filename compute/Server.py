@@ -1,6 +1,10 @@
+from pulumi import Output
 from pulumi.resource import ComponentResource, ResourceOptions
 import pulumi_aws as aws
 
+import util.Lookup as Lookup
+import util.Trace as Trace
+
 
 class Server(ComponentResource):
     """
@@ -10,42 +14,57 @@ class Server(ComponentResource):
     :param size The size of the ec2 instance
     :param security_groups A list of security group ids to attach to the ec2
     :param tags A dictionary of tags to attach to the instance
+    :param profile A PerformanceProfile with the placement group, root volume, AMI & cpu options of the instance
     """
-    def __init__(self, name, size="t2.micro", security_groups=None, tags=None, subnet_id=None, key=None, user_data_dict=None):
+    @Trace.component
+    def __init__(self, name, size="t2.micro", security_groups=None, tags=None, subnet_id=None, key=None, user_data_dict=None,
+                 profile=None):
         ComponentResource.__init__(self, "aws:compute:server", name, None, None)
 
         type = tags['type']
 
+        if profile is not None:
+            profile.validate(size)
+
         self.user_data = self.get_user_data(user_data_dict)
-        self.ami_id = _get_ami()
+        self.ami_id = _get_ami(profile, size)
         self.size = size
         self.name = name
         self.security_groups = security_groups
         self.subnet_id = subnet_id
+        self.placement_group = profile.create_placement_group(name, self) if profile is not None else None
+        profile_args = profile.instance_args() if profile is not None else {}
 
         server = aws.ec2.Instance(self.name, instance_type=self.size, security_groups=self.security_groups,
                                   tags=tags, ami=self.ami_id, user_data=self.user_data, key_name=key,
                                   associate_public_ip_address=_get_public_ip(type), subnet_id=self.subnet_id,
-                                  __opts__=ResourceOptions(parent=self))
+                                  placement_group=self.placement_group, opts=ResourceOptions(parent=self), **profile_args)
 
         self.public_dns = server.public_dns
         self.private_ip = server.private_ip
 
-    def get_user_data(self, user_data_dict):
+    @staticmethod
+    def get_user_data(user_data_dict):
         if user_data_dict is None:
             return None
         elif user_data_dict['type'] == "bastion" or user_data_dict['type'] == "Bastion":
-            # expect private key data to load onto bastion
+            # expect private key data to load onto bastion. An Output, e.g. from util.Keys, lets the key be generated
+            # while the rest of the stack is declared
             private_key_string = user_data_dict['private']
-            user_data = '#!/bin/bash' '\n' 'echo "%s" > bastion.pem' % private_key_string
-            return user_data
+            if isinstance(private_key_string, Output):
+                return private_key_string.apply(_bastion_user_data)
+            return _bastion_user_data(private_key_string)
         else:
             return None
 
 
-def _get_ami():
-    ami = aws.get_ami(most_recent=True, owners=["amazon"], filters=[{"name": "name", "values" :["amzn-ami-hvm-*"]}])
-    return ami.id
+def _bastion_user_data(private_key_string):
+    return '#!/bin/bash' '\n' 'echo "%s" > bastion.pem' % private_key_string
+
+
+def _get_ami(profile=None, *instance_types):
+    ami_id = profile.ami_id(*instance_types) if profile is not None else None
+    return ami_id or Lookup.get_ami_id(Lookup.AMAZON_LINUX_AMI)
 
 
 def _get_public_ip(type):
@@ -0,0 +1,94 @@
+from pulumi.errors import RunError
+from pulumi.resource import ComponentResource, ResourceOptions
+import pulumi_aws as aws
+
+import util.Trace as Trace
+from compute.Server import Server, _get_ami, _get_public_ip
+
+
+class ServerFleet(ComponentResource):
+    """
+    Create count ec2 instances spread round robin across subnets. The AMI, tags & user data are worked out once
+    for the whole fleet. Instance names are stable (name-0, name-1, ...) so growing the fleet only adds instances.
+
+    :param name The name of the fleet. Instances are named name-<index>
+    :param count The number of instances to create
+    :param size The size of the ec2 instances
+    :param security_groups A list of security group ids to attach to the instances
+    :param tags A dictionary of tags to attach to every instance. The type tag works as it does for Server
+    :param network A Network to spread the instances across. Public subnets are used when public is True
+    :param subnet_ids A list of subnet ids to spread the instances across, instead of a network
+    :param public Place the instances in public subnets. Defaults to True for bastions
+    :param key The key pair name to launch the instances with
+    :param user_data_dict User data settings as for Server
+    :param batch_size Create the instances batch_size at a time, each batch waiting on the one before it, to keep
+           under EC2 API rate limits. All instances are created together when None
+    :param overrides A dictionary of instance index to a dictionary of size, tags, subnet_id or user_data to use
+           for that instance only. Override tags are merged into the fleet tags
+    :param profile A PerformanceProfile for every instance. Its placement group & AMI are shared by the whole fleet, so
+           the instance types need to share an architecture
+    """
+    @Trace.component
+    def __init__(self, name, count=1, size="t2.micro", security_groups=None, tags=None, network=None, subnet_ids=None,
+                 public=None, key=None, user_data_dict=None, batch_size=None, overrides=None, profile=None):
+        ComponentResource.__init__(self, "aws:compute:serverfleet", name, None, None)
+
+        tags = tags or {}
+        overrides = overrides or {}
+        type = tags.get('type')
+        if public is None:
+            public = _get_public_ip(type)
+
+        if subnet_ids is None and network is not None:
+            subnet_ids = network.public_subnets if public else network.private_subnets
+        if not subnet_ids:
+            raise RunError("a ServerFleet needs a network or a list of subnet ids")
+        if batch_size is not None and batch_size < 1:
+            raise RunError("batch_size must be at least 1. %d entered" % batch_size)
+        unknown = [index for index in overrides if index < 0 or index >= count]
+        if unknown:
+            raise RunError("overrides given for instances that are not in the fleet: %s" % unknown)
+        sizes = sorted(set([size] + [override['size'] for override in overrides.values() if 'size' in override]))
+        if profile is not None:
+            for instance_size in sizes:
+                profile.validate(instance_size)
+
+        self.name = name
+        self.count = count
+        # worked out once & shared by every instance
+        self.ami_id = _get_ami(profile, *sizes)
+        self.user_data = Server.get_user_data(user_data_dict)
+        self.associate_public_ip_address = public
+        self.placement_group = profile.create_placement_group(name, self) if profile is not None else None
+        profile_args = profile.instance_args() if profile is not None else {}
+
+        self.instances = []
+        previous_batch = []
+        current_batch = []
+        for index in range(count):
+            override = overrides.get(index, {})
+            instance_tags = dict(tags, Name="%s-%d" % (name, index))
+            instance_tags.update(override.get('tags', {}))
+
+            depends_on = previous_batch if batch_size is not None else None
+            instance = aws.ec2.Instance("%s-%d" % (name, index), instance_type=override.get('size', size),
+                                        vpc_security_group_ids=security_groups, tags=instance_tags, ami=self.ami_id,
+                                        user_data=override.get('user_data', self.user_data), key_name=key,
+                                        associate_public_ip_address=public, placement_group=self.placement_group,
+                                        subnet_id=override.get('subnet_id', subnet_ids[index % len(subnet_ids)]),
+                                        opts=ResourceOptions(parent=self, depends_on=depends_on), **profile_args)
+            self.instances.append(instance)
+
+            if batch_size is not None:
+                current_batch.append(instance)
+                if len(current_batch) == batch_size:
+                    previous_batch, current_batch = current_batch, []
+
+        self.instance_ids = [instance.id for instance in self.instances]
+        self.private_ips = [instance.private_ip for instance in self.instances]
+        self.public_dns = [instance.public_dns for instance in self.instances]
+
+        self.register_outputs({
+            "instance_ids": self.instance_ids,
+            "private_ips": self.private_ips
+        })
@@ -0,0 +1,135 @@
+"""
+Render the user data that joins a worker node to an EKS cluster
+"""
+
+DEFAULT_TIMING_LOG = "/var/log/eks-bootstrap-timing.log"
+
+# Appends one json line per boot phase to the timing log, with the instance type & AMI so time to ready can be
+# compared across both. node_ready is taken from the kubelet log, so it is only as accurate as the kubelet's own logging
+BOOTSTRAP_SCRIPT = """TIMING_LOG=%(timing_log)s
+mkdir -p $(dirname $TIMING_LOG)
+imds() {
+  local token=$(curl -s -X PUT http://169.254.169.254/latest/api/token -H "X-aws-ec2-metadata-token-ttl-seconds: 60")
+  curl -s -H "X-aws-ec2-metadata-token: $token" http://169.254.169.254/latest/meta-data/$1
+}
+INSTANCE_TYPE=$(imds instance-type)
+AMI_ID=$(imds ami-id)
+phase_at() {
+  echo "{\\"phase\\": \\"$1\\", \\"time\\": $2, \\"instance_type\\": \\"$INSTANCE_TYPE\\", \\"ami_id\\": \\"$AMI_ID\\"}" >> $TIMING_LOG
+}
+phase() {
+  phase_at $1 $(date +%%s.%%N)
+}
+phase_at boot $(date -d "$(uptime -s)" +%%s)
+CLOUD_INIT_START=$(date -d "$(head -1 /var/log/cloud-init.log | cut -c1-19)" +%%s 2>/dev/null) && phase_at cloud_init_start $CLOUD_INIT_START
+phase user_data_start
+%(pre_bootstrap)s
+phase bootstrap_start
+/etc/eks/bootstrap.sh --apiserver-endpoint %(endpoint)s --b64-cluster-ca %(ca)s %(bootstrap_args)s%(name)s
+BOOTSTRAP_STATUS=$?
+phase bootstrap_end
+(
+  for i in $(seq 600); do curl -sf http://localhost:10248/healthz > /dev/null && phase kubelet_healthy && break; sleep 1; done
+  for i in $(seq 600); do journalctl -u kubelet --no-pager | grep -q NodeReady && phase node_ready && break; sleep 1; done
+) > /dev/null 2>&1 &
+"""
+
+# Instances launched into a warm pool run their user data, then stop. Joining the cluster then would leave a NotReady
+# node behind, so bootstrap runs from a per boot script once the instance is headed into service
+WARM_POOL_SCRIPT = """cat > /var/lib/cloud/scripts/per-boot/eks-bootstrap.sh <<'SCRIPT'
+#!/bin/bash
+set -o xtrace
+[ -f /var/lib/eks-bootstrapped ] && exit 0
+TOKEN=$(curl -s -X PUT http://169.254.169.254/latest/api/token -H "X-aws-ec2-metadata-token-ttl-seconds: 60")
+STATE=$(curl -s -H "X-aws-ec2-metadata-token: $TOKEN" http://169.254.169.254/latest/meta-data/autoscaling/target-lifecycle-state)
+case "$STATE" in Warmed:*) exit 0 ;; esac
+%(bootstrap)s
+[ $BOOTSTRAP_STATUS -eq 0 ] && touch /var/lib/eks-bootstrapped
+SCRIPT
+chmod +x /var/lib/cloud/scripts/per-boot/eks-bootstrap.sh
+/var/lib/cloud/scripts/per-boot/eks-bootstrap.sh
+"""
+
+
+class NodeUserData(object):
+    """
+    Build the user data for EKS nodes: bootstrap.sh with kubelet & container runtime tuning, plus boot phase
+    timestamps written to timing_log.
+
+    :param max_pods The most pods the kubelet will run. Defaults to the AMI's ENI based limit
+    :param serialize_image_pulls Pull images one at a time. False lets the kubelet pull in parallel
+    :param max_parallel_image_pulls The most images pulled at once when pulls are not serialized (kubelet 1.27+)
+    :param eviction_hard A dictionary of eviction signal to threshold, e.g. {"memory.available": "200Mi"}
+    :param kube_reserved A dictionary of resource to amount reserved for kubernetes daemons, e.g. {"cpu": "250m"}
+    :param system_reserved A dictionary of resource to amount reserved for the os
+    :param container_runtime The container runtime bootstrap.sh sets up, e.g. containerd. Defaults to the AMI's
+    :param kubelet_extra_args A list of any other kubelet flags
+    :param bootstrap_extra_args A list of any other bootstrap.sh flags
+    :param pre_bootstrap Shell commands to run before bootstrap.sh, e.g. to pre pull images
+    :param timing_log Where the boot phase timestamps are written
+    :param warm_pool Defer bootstrap until the instance leaves the warm pool
+    """
+    def __init__(self, max_pods=None, serialize_image_pulls=True, max_parallel_image_pulls=None, eviction_hard=None,
+                 kube_reserved=None, system_reserved=None, container_runtime=None, kubelet_extra_args=None,
+                 bootstrap_extra_args=None, pre_bootstrap=None, timing_log=DEFAULT_TIMING_LOG, warm_pool=False):
+        self.max_pods = max_pods
+        self.serialize_image_pulls = serialize_image_pulls
+        self.max_parallel_image_pulls = max_parallel_image_pulls
+        self.eviction_hard = eviction_hard
+        self.kube_reserved = kube_reserved
+        self.system_reserved = system_reserved
+        self.container_runtime = container_runtime
+        self.kubelet_extra_args = kubelet_extra_args or []
+        self.bootstrap_extra_args = bootstrap_extra_args or []
+        self.pre_bootstrap = pre_bootstrap
+        self.timing_log = timing_log
+        self.warm_pool = warm_pool
+
+    def kubelet_args(self):
+        args = []
+        if self.max_pods is not None:
+            args.append("--max-pods=%d" % self.max_pods)
+        if not self.serialize_image_pulls:
+            args.append("--serialize-image-pulls=false")
+            if self.max_parallel_image_pulls is not None:
+                args.append("--max-parallel-image-pulls=%d" % self.max_parallel_image_pulls)
+        if self.eviction_hard:
+            args.append("--eviction-hard=%s" % _join("<", self.eviction_hard))
+        if self.kube_reserved:
+            args.append("--kube-reserved=%s" % _join("=", self.kube_reserved))
+        if self.system_reserved:
+            args.append("--system-reserved=%s" % _join("=", self.system_reserved))
+        return args + list(self.kubelet_extra_args)
+
+    def bootstrap_args(self):
+        args = []
+        if self.max_pods is not None:
+            # otherwise bootstrap.sh sets its own --max-pods from the ENI limits
+            args.append("--use-max-pods false")
+        if self.container_runtime is not None:
+            args.append("--container-runtime %s" % self.container_runtime)
+        kubelet_args = self.kubelet_args()
+        if kubelet_args:
+            args.append("--kubelet-extra-args '%s'" % " ".join(kubelet_args))
+        return args + list(self.bootstrap_extra_args)
+
+    def render(self, endpoint, ca, name):
+        """
+        Return the user data script
+
+        :param endpoint The cluster's API server endpoint
+        :param ca The cluster's base64 encoded certificate authority
+        :param name The name of the cluster
+        """
+        bootstrap_args = "".join("%s " % arg for arg in self.bootstrap_args())
+        bootstrap = BOOTSTRAP_SCRIPT % {"timing_log": self.timing_log, "pre_bootstrap": self.pre_bootstrap or "",
+                                        "endpoint": endpoint, "ca": ca, "bootstrap_args": bootstrap_args, "name": name}
+        if self.warm_pool:
+            bootstrap = WARM_POOL_SCRIPT % {"bootstrap": bootstrap.rstrip("\n")}
+        else:
+            bootstrap += "exit $BOOTSTRAP_STATUS\n"
+        return "#!/bin/bash\nset -o xtrace\n" + bootstrap
+
+
+def _join(separator, settings):
+    return ",".join("%s%s%s" % (key, separator, settings[key]) for key in sorted(settings))
@@ -1,3 +1,12 @@
 """
 Deploy options for various compute
-"""
\ No newline at end of file
+"""
+import util.Lazy as Lazy
+
+Lazy.exports(__name__, {
+    "Cluster": "compute.EKS",
+    "ClusterRoles": "compute.EKS",
+    "NodeUserData": "compute.UserData",
+    "VpcCni": "compute.Cni",
+    "PerformanceProfile": "compute.Profile",
+})
@@ -0,0 +1,56 @@
+import json
+import os
+from unittest import TestCase
+
+from pulumi.errors import RunError
+
+import bench.Mocks as Mocks
+from compute.Cni import VpcCni
+from compute.EKS import Cluster
+from network.Network import Network
+
+
+class TestVpcCni(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        os.environ.setdefault("PAVE_WORKSTATION_IP", Mocks.WORKSTATION_IP)
+
+    def build(self, cni, **kwargs):
+        clusters = []
+        monitor = Mocks.run(lambda: clusters.append(Cluster("cluster", node_count=2, vpc_id="vpc-id", subnet_ids=["subnet-a"],
+                                                            version="1.14.8", instance_type="m5.large", cni=cni, **kwargs)))
+        return clusters[0], monitor
+
+    def test_prefix_delegation_max_pods(self):
+        # an m5.large has 3 ENIs of 10 addresses: 3 * 9 * 16 + 2, capped at 110
+        cluster, monitor = self.build(VpcCni())
+        self.assertEqual(110, cluster.node_user_data.max_pods)
+        addon = [monitor.resources[r["urn"]].state for r in monitor.registrations if r["type"] == "aws:eks/addon:Addon"][0]
+        self.assertEqual({"ENABLE_PREFIX_DELEGATION": "true", "WARM_PREFIX_TARGET": "1"},
+                         json.loads(addon["configurationValues"])["env"])
+
+    def test_custom_networking_max_pods(self):
+        # the primary ENI holds no pods: 2 * 9 + 2
+        cni = VpcCni(prefix_delegation=False, custom_networking=True, pod_subnets={"us-east-1a": "subnet-pods"})
+        cluster, _ = self.build(cni)
+        self.assertEqual(20, cluster.node_user_data.max_pods)
+        self.assertEqual("true", cni.addon_env()["AWS_VPC_K8S_CNI_CUSTOM_NETWORK_CFG"])
+
+    def test_custom_networking_needs_pod_subnets(self):
+        with self.assertRaises(RunError):
+            VpcCni(custom_networking=True)
+
+    def test_custom_networking_on_a_network_secondary_block(self):
+        def build():
+            network = Network("network", subnet_count=6, public_subnet_count=3, az_count=3,
+                              secondary_cidr_blocks=["100.64.0.0/16"], pod_subnet_cidr_block="100.64.0.0/16")
+            cni = VpcCni(custom_networking=True, pod_subnets=network.pod_subnets)
+            cluster = Cluster("cluster", node_count=2, vpc_id=network.vpcid, subnet_ids=network.private_subnets,
+                              version="1.14.8", instance_type="m5.large", cni=cni)
+            cni.eni_configs(cluster.worker_sg).apply(manifests.append)
+        manifests = []
+        Mocks.run(build)
+        self.assertEqual(["us-east-1a", "us-east-1b", "us-east-1c"],
+                         [line.split(": ")[1] for line in manifests[0].splitlines() if line.startswith("  name:")])
+        self.assertIn("subnet: network-0-pod-subnet-id", manifests[0])
@@ -0,0 +1,111 @@
+import os
+from unittest import TestCase
+
+from pulumi.errors import RunError
+from pulumi.resource import ComponentResource, ResourceOptions
+
+import bench.Mocks as Mocks
+from compute.ClusterFleet import ClusterFleet
+from compute.EKS import Cluster, _split
+
+
+class TestCluster(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        os.environ.setdefault("PAVE_WORKSTATION_IP", Mocks.WORKSTATION_IP)
+
+    def build(self, **kwargs):
+        clusters = []
+        monitor = Mocks.run(lambda: clusters.append(Cluster("cluster", vpc_id="vpc-id", subnet_ids=["subnet-a", "subnet-b", "subnet-c"],
+                                                            version="1.14.8", **kwargs)))
+        return clusters[0], monitor
+
+    def states(self, monitor, type):
+        return dict((r["name"], monitor.resources[r["urn"]].state) for r in monitor.registrations if r["type"] == type)
+
+    def test_launch_template(self):
+        _, monitor = self.build(node_count=2)
+        groups = self.states(monitor, "aws:autoscaling/group:Group")
+        self.assertEqual(["cluster-asg"], list(groups))
+        self.assertIn("launchTemplate", groups["cluster-asg"])
+        self.assertEqual({}, self.states(monitor, "aws:ec2/launchConfiguration:LaunchConfiguration"))
+
+    def test_mixed_instances_per_az(self):
+        _, monitor = self.build(node_count=4, max_size=7, instance_types=["m5.large", "m5a.large"], on_demand_percentage=25,
+                                node_group_per_az=True)
+        groups = self.states(monitor, "aws:autoscaling/group:Group")
+        self.assertEqual(["cluster-asg-0", "cluster-asg-1", "cluster-asg-2"], sorted(groups))
+        self.assertEqual([2, 1, 1], [groups["cluster-asg-%d" % i]["desiredCapacity"] for i in range(3)])
+        self.assertEqual([3, 2, 2], [groups["cluster-asg-%d" % i]["maxSize"] for i in range(3)])
+        policy = groups["cluster-asg-0"]["mixedInstancesPolicy"]
+        self.assertEqual(25, policy["instancesDistribution"]["onDemandPercentageAboveBaseCapacity"])
+        self.assertNotIn("warmPool", groups["cluster-asg-0"])
+        self.assertTrue(groups["cluster-asg-0"]["capacityRebalance"])
+
+    def test_warm_pool(self):
+        _, monitor = self.build(node_count=2, instance_type="m5.large", warm_pool={"max_group_prepared_capacity": 2})
+        group = self.states(monitor, "aws:autoscaling/group:Group")["cluster-asg"]
+        self.assertEqual("Stopped", group["warmPool"]["poolState"])
+        self.assertIn("launchTemplate", group)
+
+    def test_warm_pool_needs_a_single_on_demand_instance_type(self):
+        with self.assertRaises(RunError):
+            self.build(node_count=2, instance_types=["m5.large", "m5a.large"], warm_pool={})
+        with self.assertRaises(RunError):
+            self.build(node_count=2, on_demand_percentage=50, warm_pool={})
+        # running pool instances never reboot, so would never join the cluster
+        with self.assertRaises(RunError):
+            self.build(node_count=2, warm_pool={"pool_state": "Running"})
+
+    def test_needs_a_version(self):
+        with self.assertRaises(RunError):
+            Mocks.run(lambda: Cluster("cluster", vpc_id="vpc-id", subnet_ids=["subnet-a"], node_count=2))
+
+    def test_existing_resources_keep_their_names(self):
+        _, monitor = self.build(node_count=2)
+        aliases = dict((r["name"], r["aliases"]) for r in monitor.registrations)
+        self.assertEqual(["eks-service-role"], aliases["cluster-eks-service-role"])
+        self.assertEqual(["eks_worker_instance_profile"], aliases["cluster-eks-worker-instance-profile"])
+        self.assertEqual(["master-sg"], aliases["cluster-master-sg"])
+
+    def test_split(self):
+        self.assertEqual([3, 3, 2], [_split(8, 3, i) for i in range(3)])
+        self.assertEqual(8, _split(8, 1, None))
+
+    def test_resources_are_namespaced_by_cluster(self):
+        _, monitor = self.build(node_count=2)
+        names = [r["name"] for r in monitor.registrations if r["custom"]]
+        self.assertIn("cluster-master-sg", names)
+        self.assertIn("cluster-policy-AmazonEKSClusterPolicy", names)
+        self.assertEqual([], [n for n in names if not n.startswith("cluster")])
+
+
+class TestClusterFleet(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        os.environ.setdefault("PAVE_WORKSTATION_IP", Mocks.WORKSTATION_IP)
+
+    def test_clusters_share_roles(self):
+        fleets = []
+        monitor = Mocks.run(lambda: fleets.append(ClusterFleet("eks", count=3, node_count=1, vpc_id="vpc-id", subnet_ids=["subnet-a"],
+                                                               version="1.14.8", overrides={2: {"node_count": 5}})))
+        types = [r["type"] for r in monitor.registrations]
+        self.assertEqual(3, types.count("aws:eks/cluster:Cluster"))
+        self.assertEqual(2, types.count("aws:iam/role:Role"))
+        self.assertEqual(5, types.count("aws:iam/rolePolicyAttachment:RolePolicyAttachment"))
+        groups = dict((r["name"], monitor.resources[r["urn"]].state) for r in monitor.registrations
+                      if r["type"] == "aws:autoscaling/group:Group")
+        self.assertEqual([1, 1, 5], [groups["eks-%d-asg" % i]["desiredCapacity"] for i in range(3)])
+        # the fleet's roles are new, so they have no old names to keep
+        self.assertEqual([], [r["aliases"] for r in monitor.registrations if r["type"] == "aws:iam/role:Role" and r["aliases"]])
+
+    def test_fleet_takes_opts(self):
+        def build():
+            parent = ComponentResource("test:index:parent", "parent")
+            ClusterFleet("eks", count=1, node_count=1, vpc_id="vpc-id", subnet_ids=["subnet-a"], version="1.14.8",
+                         opts=ResourceOptions(parent=parent))
+        monitor = Mocks.run(build)
+        parents = dict((r["type"], r["parent"]) for r in monitor.registrations)
+        self.assertTrue(parents["aws:compute:eksfleet"].endswith("test:index:parent::parent"))
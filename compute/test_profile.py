@@ -0,0 +1,97 @@
+import os
+from unittest import TestCase
+
+from pulumi.errors import RunError
+
+import bench.Mocks as Mocks
+from compute.Profile import PerformanceProfile
+from compute.Server import Server
+from compute.ServerFleet import ServerFleet
+
+
+class GravitonMocks(Mocks.BenchMocks):
+    """
+    Answer instance type lookups by family - c7g & m7g are arm64 - & keep the AMI name filters asked for
+    """
+    def __init__(self):
+        Mocks.BenchMocks.__init__(self)
+        self.ami_filters = []
+
+    def call(self, args):
+        result = Mocks.BenchMocks.call(self, args)
+        if args.token == "aws:ec2/getInstanceType:getInstanceType" and args.args["instanceType"][:3] in ("c7g", "m7g"):
+            result = dict(result, supportedArchitectures=["arm64"])
+        if args.token == "aws:ec2/getAmi:getAmi":
+            self.ami_filters += [f["values"][0] for f in args.args["filters"] if f["name"] == "name"]
+        return result
+
+
+class TestPerformanceProfile(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        os.environ.setdefault("PAVE_WORKSTATION_IP", Mocks.WORKSTATION_IP)
+
+    def states(self, monitor, type):
+        return dict((r["name"], monitor.resources[r["urn"]].state) for r in monitor.registrations if r["type"] == type)
+
+    def test_instance_args(self):
+        profile = PerformanceProfile(volume_size=100, iops=6000, throughput=500, threads_per_core=1, cpu_core_count=4)
+        self.assertEqual({"root_block_device": {"volume_type": "gp3", "volume_size": 100, "iops": 6000, "throughput": 500},
+                          "cpu_options": {"core_count": 4, "threads_per_core": 1}},
+                         profile.instance_args())
+        self.assertTrue(PerformanceProfile(ebs_optimized=True).instance_args()["ebs_optimized"])
+
+    def test_rejects_unsupported_settings(self):
+        with self.assertRaises(RunError):
+            PerformanceProfile(placement_strategy="close")
+        with self.assertRaises(RunError):
+            PerformanceProfile(partition_count=3)
+        with self.assertRaises(RunError):
+            PerformanceProfile(volume_type="gp2", throughput=250)
+
+    def test_rejects_unsupported_instance_types(self):
+        PerformanceProfile().validate("t2.micro")
+        PerformanceProfile(placement_strategy="cluster", ebs_optimized=True).validate("c5n.large")
+        with self.assertRaises(RunError):
+            PerformanceProfile(ebs_optimized=True).validate("t2.micro")
+        with self.assertRaises(RunError):
+            PerformanceProfile(placement_strategy="cluster").validate("t3.large")
+        # every instance type of a fleet is checked, before anything is created
+        with self.assertRaises(RunError):
+            Mocks.run(lambda: ServerFleet("fleet", count=2, size="c5n.large", tags={"type": "server"}, subnet_ids=["subnet-1"],
+                                          overrides={1: {"size": "t2.micro"}},
+                                          profile=PerformanceProfile(placement_strategy="cluster")))
+
+    def test_server_with_a_cluster_placement_group(self):
+        mocks = Mocks.BenchMocks()
+        profile = PerformanceProfile(placement_strategy="cluster", ebs_optimized=True)
+        monitor = Mocks.run(lambda: Server("server", size="c5n.large", tags={"type": "server"}, profile=profile), mocks)
+        self.assertEqual("cluster", self.states(monitor, "aws:ec2/placementGroup:PlacementGroup")["server-pg"]["strategy"])
+        instance = self.states(monitor, "aws:ec2/instance:Instance")["server"]
+        self.assertEqual("gp3", instance["rootBlockDevice"]["volumeType"])
+        self.assertTrue(instance["ebsOptimized"])
+        # only the ena AMI is looked up
+        self.assertEqual(1, mocks.invokes["aws:ec2/getAmi:getAmi"])
+
+    def test_ami_matches_the_architecture(self):
+        mocks = GravitonMocks()
+        Mocks.run(lambda: Server("graviton", size="c7g.large", tags={"type": "server"}, profile=PerformanceProfile()), mocks)
+        self.assertEqual(["al2023-ami-2023.*-arm64"], mocks.ami_filters)
+
+        mocks = GravitonMocks()
+        Mocks.run(lambda: Server("intel", size="c5n.large", tags={"type": "server"}, profile=PerformanceProfile()), mocks)
+        self.assertEqual(["al2023-ami-2023.*-x86_64"], mocks.ami_filters)
+
+    def test_fleet_instance_types_share_an_architecture(self):
+        with self.assertRaises(RunError):
+            Mocks.run(lambda: ServerFleet("fleet", count=2, size="c5n.large", tags={"type": "server"}, subnet_ids=["subnet-1"],
+                                          overrides={1: {"size": "c7g.large"}}, profile=PerformanceProfile()),
+                      GravitonMocks())
+
+    def test_fleet_shares_one_placement_group(self):
+        profile = PerformanceProfile(placement_strategy="partition", partition_count=3)
+        monitor = Mocks.run(lambda: ServerFleet("fleet", count=4, tags={"type": "server"}, subnet_ids=["subnet-1"],
+                                                profile=profile))
+        self.assertEqual(["fleet-pg"], list(self.states(monitor, "aws:ec2/placementGroup:PlacementGroup")))
+        self.assertEqual(4, len(self.states(monitor, "aws:ec2/instance:Instance")))
@@ -7,6 +7,6 @@ class TestServer(TestCase):
     def test_get_user_data(self):
         content = {'type': 'bastion', 'private': 'private_key'}
         result = Server.get_user_data(content)
-        expected = '#!/bin/bash' '\n' 'echo private_key > bastion.pem'
+        expected = '#!/bin/bash' '\n' 'echo "private_key" > bastion.pem'
         self.assertEqual(expected, result)
 
@@ -0,0 +1,26 @@
+from unittest import TestCase
+
+from compute.UserData import NodeUserData
+
+
+class TestNodeUserData(TestCase):
+
+    def test_default_bootstrap(self):
+        script = NodeUserData().render("https://endpoint", "Y2E=", "cluster")
+        self.assertTrue(script.startswith("#!/bin/bash\n"))
+        self.assertIn("/etc/eks/bootstrap.sh --apiserver-endpoint https://endpoint --b64-cluster-ca Y2E= cluster\n", script)
+        self.assertIn("phase bootstrap_start", script)
+        self.assertIn("phase bootstrap_end", script)
+
+    def test_kubelet_tuning(self):
+        user_data = NodeUserData(max_pods=110, serialize_image_pulls=False, max_parallel_image_pulls=4,
+                                 eviction_hard={"nodefs.available": "10%", "memory.available": "200Mi"},
+                                 container_runtime="containerd")
+        self.assertEqual(["--use-max-pods false", "--container-runtime containerd",
+                          "--kubelet-extra-args '--max-pods=110 --serialize-image-pulls=false --max-parallel-image-pulls=4 "
+                          "--eviction-hard=memory.available<200Mi,nodefs.available<10%'"], user_data.bootstrap_args())
+
+    def test_warm_pool_defers_bootstrap(self):
+        script = NodeUserData(warm_pool=True).render("https://endpoint", "Y2E=", "cluster")
+        self.assertIn("/var/lib/cloud/scripts/per-boot/eks-bootstrap.sh", script)
+        self.assertIn("Warmed:*) exit 0", script)
@@ -0,0 +1,120 @@
+"""
+Carve non overlapping subnets out of one or more CIDR blocks
+"""
+import bisect
+import ipaddress
+
+from pulumi.errors import RunError
+
+
+def overlapping(cidrs):
+    """
+    Return the pairs of CIDRs in a list that overlap each other
+
+    :param cidrs A list of CIDR strings
+    """
+    networks = sorted((ipaddress.ip_network(c) for c in cidrs), key=lambda n: (int(n.network_address), -n.prefixlen))
+    pairs = []
+    # sorted by start address, so each network can only overlap those after it that start before it ends
+    for i, network in enumerate(networks):
+        end = int(network.broadcast_address)
+        for other in networks[i + 1:]:
+            if int(other.network_address) > end:
+                break
+            pairs.append((str(network), str(other)))
+    return pairs
+
+
+class CidrAllocator(object):
+    """
+    Hand out aligned, non overlapping networks from a set of CIDR blocks. Allocations are kept in an interval index
+    sorted by start address, so an overlap check is a binary search rather than a scan of every allocation.
+
+    :param cidr_block The primary CIDR block, e.g. 10.0.0.0/16
+    :param secondary_cidr_blocks A list of additional CIDR blocks, e.g. ["100.64.0.0/16"]
+    """
+    def __init__(self, cidr_block, secondary_cidr_blocks=None):
+        self.blocks = [ipaddress.ip_network(cidr_block)]
+        for block in (secondary_cidr_blocks or []):
+            self.blocks.append(ipaddress.ip_network(block))
+
+        clashes = overlapping([str(b) for b in self.blocks])
+        if clashes:
+            raise RunError("CIDR blocks overlap: %s" % ", ".join("%s & %s" % pair for pair in clashes))
+
+        self._starts = []
+        self._allocations = []
+
+    @property
+    def allocations(self):
+        return [str(n) for n in self._allocations]
+
+    def overlaps(self, cidr):
+        """
+        Return the allocations overlapping cidr
+        """
+        network = ipaddress.ip_network(cidr)
+        start, end = int(network.network_address), int(network.broadcast_address)
+        # allocations never overlap each other, so only the one starting at or before start can reach into cidr
+        i = max(bisect.bisect_right(self._starts, start) - 1, 0)
+        found = []
+        while i < len(self._allocations) and self._starts[i] <= end:
+            if int(self._allocations[i].broadcast_address) >= start:
+                found.append(str(self._allocations[i]))
+            i += 1
+        return found
+
+    def reserve(self, cidr):
+        """
+        Mark a specific network as allocated. It must fall inside one of the blocks & not overlap other allocations
+        """
+        network = ipaddress.ip_network(cidr)
+        if not any(network.subnet_of(block) for block in self.blocks if block.version == network.version):
+            raise RunError("%s is outside of the CIDR blocks %s" % (cidr, ", ".join(str(b) for b in self.blocks)))
+        clashes = self.overlaps(cidr)
+        if clashes:
+            raise RunError("%s overlaps %s" % (cidr, ", ".join(clashes)))
+        self._insert(network)
+        return str(network)
+
+    def allocate(self, prefixlen, block=None):
+        """
+        Allocate the lowest free network of the given prefix length
+
+        :param prefixlen The size of the network, e.g. 24 for a /24
+        :param block Only allocate from this CIDR block. Defaults to trying each block in order
+        """
+        blocks = self.blocks
+        if block is not None:
+            blocks = [b for b in self.blocks if b == ipaddress.ip_network(block)]
+            if not blocks:
+                raise RunError("%s is not one of the CIDR blocks %s" % (block, ", ".join(str(b) for b in self.blocks)))
+
+        for candidate_block in blocks:
+            network = self._first_free(candidate_block, prefixlen)
+            if network is not None:
+                self._insert(network)
+                return str(network)
+        raise RunError("no free /%d left in %s" % (prefixlen, ", ".join(str(b) for b in blocks)))
+
+    def _first_free(self, block, prefixlen):
+        if prefixlen < block.prefixlen or prefixlen > block.max_prefixlen:
+            return None
+        size = 2 ** (block.max_prefixlen - prefixlen)
+        candidate = int(block.network_address)
+        last = int(block.broadcast_address)
+        while candidate + size - 1 <= last:
+            network = ipaddress.ip_network((type(block.network_address)(candidate), prefixlen))
+            clashes = self.overlaps(str(network))
+            if not clashes:
+                return network
+            # jump past the last clash, keeping the candidate aligned to its size
+            clash_end = int(ipaddress.ip_network(clashes[-1]).broadcast_address) + 1
+            candidate = ((clash_end + size - 1) // size) * size
+        return None
+
+    def _insert(self, network):
+        start = int(network.network_address)
+        i = bisect.bisect_left(self._starts, start)
+        self._starts.insert(i, start)
+        self._allocations.insert(i, network)
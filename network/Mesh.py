@@ -0,0 +1,211 @@
+"""
+Many vpcs from one address plan, joined by Transit Gateways
+"""
+import pulumi_aws as aws
+from pulumi.errors import RunError
+from pulumi.resource import ComponentResource, ResourceOptions
+from pulumi_aws import ec2, ec2transitgateway
+
+import util.Lookup as Lookup
+import util.Trace as Trace
+from network.Cidr import CidrAllocator
+from network.Network import Network
+from util.Prefetch import Prefetch
+
+DEFAULT_ADDRESS_SPACE = "10.0.0.0/8"
+DEFAULT_AMAZON_SIDE_ASN = 64512
+
+
+class NetworkMesh(ComponentResource):
+    """
+    Create a Network per vpc, each with its own CIDR block from address_space so none of them overlap, & attach
+    them to a Transit Gateway in their region. Every vpc propagates its routes to the Transit Gateway route table &
+    sends the rest of address_space to the Transit Gateway, so any vpc reaches any other without a bastion in between.
+    The Transit Gateways of different regions are peered with static routes to the vpcs on the other side.
+
+    The vpcs do not depend on each other, so the engine creates them in parallel. The availability zones of every
+    region & the workstation IP are looked up together before the first vpc is declared.
+
+    :param name The name of the mesh. Transit Gateways are named name-<region>-tgw, name-tgw in the current region
+    :param vpcs A list of dictionaries, one per vpc, of Network arguments plus:
+           name - the name of the vpc, required
+           region - the region of the vpc. Defaults to the current region
+           prefix - the prefix length of the vpc's CIDR block. Defaults to vpc_prefix
+           cidr_block - a CIDR block in address_space to use instead of allocating one
+    :param address_space The CIDR block every vpc's CIDR block is carved from
+    :param vpc_prefix The prefix length of the vpcs' CIDR blocks, e.g. 16 for a /16
+    :param tags Dictionary of tags to attach to the Transit Gateways & their attachments
+    :param amazon_side_asn The BGP ASN of the first Transit Gateway. Each other region's gets the next one
+    :param timeout Seconds to wait for the availability zone lookups. Defaults to PAVE_LOOKUP_TIMEOUT or 30
+    """
+    @Trace.component
+    def __init__(self, name, vpcs=None, address_space=DEFAULT_ADDRESS_SPACE, vpc_prefix=16, tags=None,
+                 amazon_side_asn=DEFAULT_AMAZON_SIDE_ASN, timeout=None):
+        ComponentResource.__init__(self, "aws:network:mesh", name, None, None)
+
+        vpcs = vpcs or []
+        names = [vpc.get("name") for vpc in vpcs]
+        if not vpcs or None in names:
+            raise RunError("a NetworkMesh needs a list of vpcs, each with a name")
+        duplicates = sorted(set(n for n in names if names.count(n) > 1))
+        if duplicates:
+            raise RunError("vpc names must be unique in a mesh: %s" % ", ".join(duplicates))
+
+        self.name = name
+        self.address_space = address_space
+        self.tags = tags
+        self.allocator = CidrAllocator(address_space)
+        # keyed by vpc name
+        self.networks = {}
+        self.cidr_blocks = {}
+        self.attachments = {}
+        # keyed by region, None for the current region
+        self.providers = {}
+        self.transit_gateways = {}
+        self.route_tables = {}
+        self.peering_attachments = {}
+
+        # the blocks asked for are reserved first so allocation works around them
+        for vpc in vpcs:
+            if vpc.get("cidr_block") is not None:
+                self.cidr_blocks[vpc["name"]] = self.allocator.reserve(vpc["cidr_block"])
+        for vpc in vpcs:
+            if vpc["name"] not in self.cidr_blocks:
+                self.cidr_blocks[vpc["name"]] = self.allocator.allocate(vpc.get("prefix", vpc_prefix))
+
+        regions = self._get_regions(vpcs)
+        for region in regions:
+            if region is not None:
+                self.providers[region] = aws.Provider("%s-%s" % (name, region), region=region,
+                                                      opts=ResourceOptions(parent=self))
+        self._prefetch_availability_zones(regions, timeout)
+
+        for i, region in enumerate(regions):
+            self._create_transit_gateway(region, amazon_side_asn + i)
+
+        for vpc in vpcs:
+            self._create_vpc(vpc, self._region_key(vpc.get("region")))
+
+        for i, region in enumerate(regions):
+            for peer_region in regions[i + 1:]:
+                self._peer(region, peer_region, vpcs)
+
+        self.vpc_ids = dict((vpc_name, network.vpcid) for vpc_name, network in self.networks.items())
+        self.transit_gateway_ids = dict((region, tgw.id) for region, tgw in self.transit_gateways.items())
+
+        self.register_outputs({
+            "vpc_ids": self.vpc_ids,
+            "cidr_blocks": self.cidr_blocks,
+            # outputs need string keys, & the current region may not have been looked up
+            "transit_gateway_ids": dict((self._region_name(region) or Lookup.get_region(), tgw_id)
+                                        for region, tgw_id in self.transit_gateway_ids.items())
+        })
+
+    def _get_regions(self, vpcs):
+        # the current region is only looked up when other regions are asked for, to tell whether it is one of them
+        self.home_region = None
+        if any(vpc.get("region") is not None for vpc in vpcs):
+            self.home_region = Lookup.get_region_name()
+        regions = []
+        for vpc in vpcs:
+            region = self._region_key(vpc.get("region"))
+            if region not in regions:
+                regions.append(region)
+        return regions
+
+    def _region_key(self, region):
+        return None if region == self.home_region else region
+
+    def _region_name(self, region):
+        return region if region is not None else self.home_region
+
+    def _prefix(self, region):
+        return self.name if region is None else "%s-%s" % (self.name, region)
+
+    def _opts(self, region, **kwargs):
+        return ResourceOptions(parent=self, provider=self.providers.get(region), **kwargs)
+
+    def _prefetch_availability_zones(self, regions, timeout):
+        prefetch = Prefetch(availability_zones=None in regions, workstation_ip=True, timeout=timeout)
+        # the other regions are looked up through their providers, alongside the current region's
+        for region in regions:
+            if region is not None:
+                prefetch.add("availability_zones:%s" % region, Lookup.fetch_availability_zone_ids, region,
+                             self.providers[region])
+        prefetch.wait()
+
+    def _create_transit_gateway(self, region, asn):
+        prefix = self._prefix(region)
+        # attachments are associated & propagated explicitly, so the default route table is not used
+        tgw = ec2transitgateway.TransitGateway("%s-tgw" % prefix, amazon_side_asn=asn, description="%s mesh" % self.name,
+                                               default_route_table_association="disable",
+                                               default_route_table_propagation="disable",
+                                               dns_support="enable", tags=self.tags, opts=self._opts(region))
+        route_table = ec2transitgateway.RouteTable("%s-tgw-rt" % prefix, transit_gateway_id=tgw.id, tags=self.tags,
+                                                   opts=self._opts(region))
+        self.transit_gateways[region] = tgw
+        self.route_tables[region] = route_table
+
+    def _create_vpc(self, vpc, region):
+        vpc_name = vpc["name"]
+        args = dict((k, v) for k, v in vpc.items() if k not in ("name", "region", "prefix"))
+        args["cidr_block"] = self.cidr_blocks[vpc_name]
+        network = Network(vpc_name, region=region, opts=self._opts(region), **args)
+        self.networks[vpc_name] = network
+
+        tgw = self.transit_gateways[region]
+        route_table = self.route_tables[region]
+
+        # one subnet per availability zone, as for the interface endpoints
+        attachment_subnets = []
+        attachment_azs = set()
+        for subnet_id, az_index in zip(network.private_subnets, network.private_subnet_azs):
+            if az_index not in attachment_azs:
+                attachment_azs.add(az_index)
+                attachment_subnets.append(subnet_id)
+
+        attachment = ec2transitgateway.VpcAttachment("%s-tgw-attachment" % vpc_name, transit_gateway_id=tgw.id,
+                                                     vpc_id=network.vpcid, subnet_ids=attachment_subnets,
+                                                     transit_gateway_default_route_table_association=False,
+                                                     transit_gateway_default_route_table_propagation=False,
+                                                     tags=self.tags, opts=self._opts(region))
+        ec2transitgateway.RouteTableAssociation("%s-tgw-rt-assoc" % vpc_name, transit_gateway_attachment_id=attachment.id,
+                                                transit_gateway_route_table_id=route_table.id, opts=self._opts(region))
+        ec2transitgateway.RouteTablePropagation("%s-tgw-rt-propagation" % vpc_name,
+                                                transit_gateway_attachment_id=attachment.id,
+                                                transit_gateway_route_table_id=route_table.id, opts=self._opts(region))
+        self.attachments[vpc_name] = attachment.id
+
+        # the vpc's own block is more specific, so only traffic for the other vpcs goes to the Transit Gateway
+        route_table_ids = [network.public_route_table_id] + list(network.private_route_tables.values())
+        for i, route_table_id in enumerate(route_table_ids):
+            ec2.Route("%s-%d-mesh-route" % (vpc_name, i), route_table_id=route_table_id,
+                      destination_cidr_block=self.address_space, transit_gateway_id=tgw.id,
+                      opts=self._opts(region, depends_on=[attachment]))
+
+    def _peer(self, region, peer_region, vpcs):
+        prefix = "%s-%s-%s" % (self.name, self._region_name(region), self._region_name(peer_region))
+        peering = ec2transitgateway.PeeringAttachment("%s-tgw-peering" % prefix,
+                                                      transit_gateway_id=self.transit_gateways[region].id,
+                                                      peer_transit_gateway_id=self.transit_gateways[peer_region].id,
+                                                      peer_region=self._region_name(peer_region), tags=self.tags,
+                                                      opts=self._opts(region))
+        accepter = ec2transitgateway.PeeringAttachmentAccepter("%s-tgw-peering-accepter" % prefix,
+                                                               transit_gateway_attachment_id=peering.id, tags=self.tags,
+                                                               opts=self._opts(peer_region))
+        self.peering_attachments[(region, peer_region)] = peering.id
+
+        # routes are not propagated over a peering, so each side gets a static route to the other side's vpcs
+        for side, other in ((region, peer_region), (peer_region, region)):
+            ec2transitgateway.RouteTableAssociation("%s-%s-tgw-rt-assoc" % (prefix, self._region_name(side)),
+                                                    transit_gateway_attachment_id=accepter.transit_gateway_attachment_id,
+                                                    transit_gateway_route_table_id=self.route_tables[side].id,
+                                                    opts=self._opts(side))
+            for vpc in vpcs:
+                if self._region_key(vpc.get("region")) != other:
+                    continue
+                ec2transitgateway.Route("%s-%s-tgw-route" % (self._prefix(side), vpc["name"]),
+                                        destination_cidr_block=self.cidr_blocks[vpc["name"]],
+                                        transit_gateway_attachment_id=accepter.transit_gateway_attachment_id,
+                                        transit_gateway_route_table_id=self.route_tables[side].id,
+                                        opts=self._opts(side))
@@ -1,13 +1,26 @@
+import ipaddress
+
 from pulumi.resource import ComponentResource, ResourceOptions
 from pulumi.errors import RunError
 from pulumi_aws import ec2
-import pulumi_aws
 
 import util.Util as Util
+import util.Lookup as Lookup
+import util.Trace as Trace
+from network.Cidr import CidrAllocator
+from network.SecurityGroups import RuleSet
+
+NAT_GATEWAY_MODES = ("single", "per_az")
+
+# what EKS nodes need to boot & pull images without going through the NAT
+DEFAULT_VPC_ENDPOINTS = ["s3", "ecr.api", "ecr.dkr", "sts", "ec2", "logs"]
+GATEWAY_ENDPOINT_SERVICES = ("s3", "dynamodb")
 
 class Network(ComponentResource):
     """
-    Create a vpc with x subnets. At a maximum, one will be public and the rest will be private. The public subnet will have a NAT gateway.
+    Create a vpc with x subnets spread across availability zones. The first public_subnet_count subnets are public and
+    the rest are private. The first public subnet will have a NAT gateway, or with nat_gateway_mode per_az every availability
+    zone gets its own NAT gateway & private route table so egress stays in the zone.
     Security groups will be created for the current IP address managing the stack.
 
     :param name The name of the vpc
@@ -15,15 +28,36 @@ class Network(ComponentResource):
     :param subnet_count The amount of subnets to create
     :param vpc_tags Dictionary of tags to attach to the VPC
     :param sg_tags Dictionary of tags to attach to the security groups created
+    :param cidr_block The primary CIDR block of the vpc
+    :param secondary_cidr_blocks A list of additional CIDR blocks to associate with the vpc, e.g. ["100.64.0.0/16"]
+    :param public_subnet_count The amount of the subnets that are public
+    :param az_count The amount of availability zones to spread the subnets across. Defaults to one per subnet, up to the
+           amount of zones in the region
+    :param public_subnet_prefix The prefix length of the public subnets, e.g. 24 for a /24
+    :param private_subnet_prefix The prefix length of the private subnets
+    :param private_subnet_cidr_block The CIDR block to carve the private subnets from. Defaults to the first with room
+    :param pod_subnet_cidr_block One of the secondary CIDR blocks to carve a pod subnet per availability zone from, e.g.
+           for the custom networking of a VpcCni. They are private & exposed as pod_subnets, keyed by zone name
+    :param pod_subnet_prefix The prefix length of the pod subnets. Defaults to splitting the block between the zones
+    :param nat_gateway_mode single for one NAT gateway shared by every private subnet, per_az for one per availability zone.
+           per_az needs a public subnet in every availability zone with a private subnet
+    :param vpc_endpoints A list of services to create VPC endpoints for, so their traffic skips the NAT, e.g. ["s3", "ecr.dkr"].
+           True creates DEFAULT_VPC_ENDPOINTS. s3 & dynamodb get gateway endpoints, the rest interface endpoints with private DNS
+    :param region The region of the vpc. Give it with an opts provider for another region. Defaults to the current region
+    :param opts ResourceOptions for the component, e.g. a parent or an aws provider. Every resource in the vpc inherits them
     """
-    def __init__(self, name, port_list=None, subnet_count=0, vpc_tags=None, sg_tags=None, private_subnets=None, security_group_ids=None, public_subnets=None):
+    @Trace.component
+    def __init__(self, name, port_list=None, subnet_count=0, vpc_tags=None, sg_tags=None, private_subnets=None, security_group_ids=None, public_subnets=None,
+                 cidr_block="10.0.0.0/16", secondary_cidr_blocks=None, public_subnet_count=1, az_count=None, public_subnet_prefix=24,
+                 private_subnet_prefix=24, private_subnet_cidr_block=None, nat_gateway_mode="single",
+                 vpc_endpoints=None, region=None, opts=None, pod_subnet_cidr_block=None, pod_subnet_prefix=None):
         ComponentResource.__init__(self, "aws:network:dtd", name, {
             "number_of_availability_zones": subnet_count,
             "use_private_subnets": True,
             "subnet_ids": private_subnets,
             "security_group_ids": security_group_ids,
             "public_subnet_ids": public_subnets
-        }, None)
+        }, opts)
 
         self.name = name
         self.port_list = port_list
@@ -32,47 +66,93 @@ class Network(ComponentResource):
         self.sg_tags = sg_tags
         self.public_subnets = []
         self.private_subnets = []
+        self.public_subnet_cidrs = []
+        self.private_subnet_cidrs = []
+        # the availability zone index of each public/private subnet, in the same order as the subnet lists
+        self.public_subnet_azs = []
+        self.private_subnet_azs = []
         self.security_group_ids = []
         self.vpcid = None
+        self.cidr_block = cidr_block
+        self.secondary_cidr_blocks = secondary_cidr_blocks or []
+        self.az_count = az_count or subnet_count
+        self.nat_gateway_mode = nat_gateway_mode
+        self.nat_gateways = []
+        # private route table id keyed by availability zone index, or by None when a single NAT gateway is shared
+        self.private_route_tables = {}
+        # endpoint id keyed by service, e.g. ecr.dkr
+        self.vpc_endpoints = {}
+        # pod subnet id & CIDR block keyed by availability zone name, e.g. us-east-1a
+        self.pod_subnets = {}
+        self.pod_subnet_cidrs = {}
+        self.region = region
+        self.provider = opts.provider if opts is not None else None
 
-        PUBLIC_SUBNET_COUNT = 0
+        if public_subnet_count < 1 or subnet_count <= public_subnet_count:
+            raise RunError("Unsupported amount of subnets! At least one public & one private subnet required. %d entered with %d public"
+                           % (subnet_count, public_subnet_count))
+        if self.az_count < 1:
+            raise RunError("Unsupported amount of availability zones! %d entered" % self.az_count)
+        if nat_gateway_mode not in NAT_GATEWAY_MODES:
+            raise RunError("Unsupported NAT gateway mode %s! One of %s supported" % (nat_gateway_mode, ", ".join(NAT_GATEWAY_MODES)))
+        if pod_subnet_cidr_block is not None and ipaddress.ip_network(pod_subnet_cidr_block) not in \
+                [ipaddress.ip_network(block) for block in self.secondary_cidr_blocks]:
+            raise RunError("Unsupported pod subnet CIDR block %s! One of the secondary CIDR blocks supported" % pod_subnet_cidr_block)
 
-        if subnet_count < 2 or subnet_count > 3:
-            raise RunError("Unsupported amount of subnets! 2 or 3 supported. %d entered" % subnet_count)
+        # subnets beyond the region's zones share zones only when az_count is left to default
+        zone_count = len(Lookup.get_availability_zone_ids(self.region, self.provider))
+        if not az_count:
+            self.az_count = min(self.az_count, zone_count)
+        elif az_count > zone_count:
+            raise RunError("Unsupported amount of availability zones! %d entered but the region has %d" % (az_count, zone_count))
+
+        # raises if the blocks overlap each other
+        self.allocator = CidrAllocator(cidr_block, self.secondary_cidr_blocks)
 
         # create the VPC
         vpc = ec2.Vpc(
             name,
-            cidr_block="10.0.0.0/16",
+            cidr_block=cidr_block,
             enable_dns_hostnames=True,
             enable_dns_support=True,
             tags=vpc_tags,
-            __opts__= ResourceOptions(parent=self)
+            opts=ResourceOptions(parent=self)
         )
 
         self.vpcid = vpc.id
+        self.cidr_associations = self._create_secondary_cidr_blocks(vpc.id)
 
         public_route_table_id = self._create_public_subnet_route_table(vpc.id)
-        private_route_table_id = None
+        self.public_route_table_id = public_route_table_id
 
         # create the subnets
         for i in range(subnet_count):
+            az_index = i % self.az_count
             # create public subnet(s) first
-            if i <= PUBLIC_SUBNET_COUNT:
-                self.public_subnets.append(self._create_public_subnet(vpc.id, public_route_table_id, i))
+            if i < public_subnet_count:
+                cidr = self.allocator.allocate(public_subnet_prefix)
+                self.public_subnets.append(self._create_public_subnet(vpc.id, public_route_table_id, i, az_index, cidr))
+                self.public_subnet_cidrs.append(cidr)
+                self.public_subnet_azs.append(az_index)
             # create private subnet(s) next
             else:
-                # do create the private route table, eip & NAT just once
-                if i == 1:
-                    public_subnet_id = self.public_subnets[0]
-                    private_route_table_id = self._create_private_subnet_route_table(public_subnet_id, vpc.id)
-                self.private_subnets.append(self._create_private_subnet(vpc.id, private_route_table_id, i))
+                private_route_table_id = self._get_private_route_table(vpc.id, az_index)
+                cidr = self.allocator.allocate(private_subnet_prefix, block=private_subnet_cidr_block)
+                self.private_subnets.append(self._create_private_subnet(vpc.id, private_route_table_id, i, az_index, cidr))
+                self.private_subnet_cidrs.append(cidr)
+                self.private_subnet_azs.append(az_index)
 
+        if pod_subnet_cidr_block is not None:
+            self._create_pod_subnets(vpc.id, pod_subnet_cidr_block, pod_subnet_prefix)
 
         self.security_group_ids = self._create_security_groups(vpc.id)
         self.public_sg = self.security_group_ids['public']
         self.private_sg = self.security_group_ids['private']
 
+        if vpc_endpoints:
+            services = DEFAULT_VPC_ENDPOINTS if vpc_endpoints is True else vpc_endpoints
+            self._create_vpc_endpoints(vpc.id, services)
+
         # This does not work because the items in the dictionary are of type Output
         # for k in all_security_group_ids:
         #     print(k)
@@ -86,67 +166,147 @@ class Network(ComponentResource):
         self.register_outputs({
             "vpc_id": vpc.id,
             "private_subnet_ids": self.private_subnets,
-            "public_subnet_ids": self.public_subnet_ids,
+            "pod_subnet_ids": self.pod_subnets,
+            "public_subnet_ids": self.public_subnets,
             "security_group_ids": self.security_group_ids
         })
 
     def _get_az(self, index):
-        zones = pulumi_aws.get_availability_zones()
-        return zones.zone_ids[index]
+        return Lookup.get_availability_zone_ids(self.region, self.provider)[index]
+
+    def _create_secondary_cidr_blocks(self, vpcid):
+        # subnets in a secondary block have to wait for it to be associated with the vpc
+        associations = {}
+        for i, block in enumerate(self.secondary_cidr_blocks):
+            associations[block] = ec2.VpcIpv4CidrBlockAssociation("%s-cidr-%d" % (self.name, i), vpc_id=vpcid, cidr_block=block,
+                                                                  opts=ResourceOptions(parent=self))
+        return associations
+
+    def _subnet_opts(self, cidr):
+        depends_on = [association for block, association in self.cidr_associations.items()
+                      if ipaddress.ip_network(cidr).subnet_of(ipaddress.ip_network(block))]
+        return ResourceOptions(parent=self, depends_on=depends_on)
 
     def _create_public_subnet_route_table(self, vpcid):
         # create the public subnet for the NAT
         ig_name = "%s-ig" % self.name
-        internet_gateway = ec2.InternetGateway(ig_name, vpc_id=vpcid, tags=self.vpc_tags, __opts__= ResourceOptions(parent=self))
+        internet_gateway = ec2.InternetGateway(ig_name, vpc_id=vpcid, tags=self.vpc_tags, opts=ResourceOptions(parent=self))
         rt_name = "%s-public-rt" % self.name
-        public_route_table = ec2.RouteTable(rt_name, vpc_id=vpcid, routes=[{
-            "cidrBlock": "0.0.0.0/0",
-            "gatewayId": internet_gateway.id
-        }], __opts__= ResourceOptions(parent=self))
+        # routes are separate resources, never inline, so other components can add routes to the same table
+        public_route_table = ec2.RouteTable(rt_name, vpc_id=vpcid, opts=ResourceOptions(parent=self))
+        ec2.Route("%s-default-route" % rt_name, route_table_id=public_route_table.id, destination_cidr_block="0.0.0.0/0",
+                  gateway_id=internet_gateway.id, opts=ResourceOptions(parent=self))
         return public_route_table.id
 
-    def _create_public_subnet(self, vpcid, public_route_table_id, azid):
-        subnet_name = "%s-%d-public-subnet" % (self.name, azid)
-        az_id = self._get_az(azid)
-        subnet = ec2.Subnet(subnet_name, availability_zone_id=az_id, cidr_block=("10.0.%d.0/24" % azid), vpc_id=vpcid, tags=self.vpc_tags,
-                            map_public_ip_on_launch=True, __opts__= ResourceOptions(parent=self))
+    def _create_public_subnet(self, vpcid, public_route_table_id, index, az_index, cidr):
+        subnet_name = "%s-%d-public-subnet" % (self.name, index)
+        az_id = self._get_az(az_index)
+        subnet = ec2.Subnet(subnet_name, availability_zone_id=az_id, cidr_block=cidr, vpc_id=vpcid, tags=self.vpc_tags,
+                            map_public_ip_on_launch=True, opts=self._subnet_opts(cidr))
 
         prta_name = "%s-rt-assoc" % subnet_name
-        public_route_table_association = ec2.RouteTableAssociation(prta_name, route_table_id=public_route_table_id, subnet_id=subnet.id, __opts__= ResourceOptions(parent=self))
+        public_route_table_association = ec2.RouteTableAssociation(prta_name, route_table_id=public_route_table_id, subnet_id=subnet.id, opts=ResourceOptions(parent=self))
         return subnet.id
 
+    def _get_nat_subnet(self, az_index):
+        if az_index is None:
+            return self.public_subnets[0]
+        for subnet_id, subnet_az in zip(self.public_subnets, self.public_subnet_azs):
+            if subnet_az == az_index:
+                return subnet_id
+        raise RunError("per_az NAT gateways need a public subnet in every availability zone with private subnets. None in zone %d" % az_index)
+
     # needs the public subnet id to pass into the NAT gateway
-    def _create_private_subnet_route_table(self, public_subnet_id, vpcid):
-        eip_name = "%s-nat-eip" % self.name
-        nat_name = "%s-nat" % self.name
-        eip = ec2.Eip(eip_name, __opts__= ResourceOptions(parent=self))
-        nat_gateway = ec2.NatGateway(nat_name, subnet_id=public_subnet_id, allocation_id=eip.id, tags=self.vpc_tags, __opts__=ResourceOptions(parent=self))
-        rt_name = "%s-private-rt" % self.name
-        private_route_table = ec2.RouteTable(rt_name, vpc_id=vpcid, routes=[{
-            "cidrBlock": "0.0.0.0/0",
-            "gatewayId": nat_gateway.id
-        }], __opts__= ResourceOptions(parent=self))
+    def _create_private_subnet_route_table(self, public_subnet_id, vpcid, az_index=None):
+        # the single shared NAT keeps its original names
+        prefix = self.name if az_index is None else "%s-%d" % (self.name, az_index)
+        eip_name = "%s-nat-eip" % prefix
+        nat_name = "%s-nat" % prefix
+        eip = ec2.Eip(eip_name, opts=ResourceOptions(parent=self))
+        nat_gateway = ec2.NatGateway(nat_name, subnet_id=public_subnet_id, allocation_id=eip.id, tags=self.vpc_tags, opts=ResourceOptions(parent=self))
+        self.nat_gateways.append(nat_gateway.id)
+        rt_name = "%s-private-rt" % prefix
+        private_route_table = ec2.RouteTable(rt_name, vpc_id=vpcid, opts=ResourceOptions(parent=self))
+        ec2.Route("%s-default-route" % rt_name, route_table_id=private_route_table.id, destination_cidr_block="0.0.0.0/0",
+                  nat_gateway_id=nat_gateway.id, opts=ResourceOptions(parent=self))
         return private_route_table.id
 
-    def _create_private_subnet(self, vpcid, private_route_table_id, azid):
+    def _get_private_route_table(self, vpcid, az_index):
+        # do create the private route table, eip & NAT just once - or once per availability zone
+        route_key = az_index if self.nat_gateway_mode == "per_az" else None
+        if route_key not in self.private_route_tables:
+            public_subnet_id = self._get_nat_subnet(route_key)
+            self.private_route_tables[route_key] = self._create_private_subnet_route_table(public_subnet_id, vpcid, route_key)
+        return self.private_route_tables[route_key]
+
+    def _create_pod_subnets(self, vpcid, block, prefix):
+        # pods are placed by zone name, e.g. by the ENIConfig of each zone
+        zone_names = Lookup.get_availability_zone_names(self.region, self.provider)
+        if prefix is None:
+            prefix = ipaddress.ip_network(block).prefixlen + (self.az_count - 1).bit_length()
+        for az_index in range(self.az_count):
+            cidr = self.allocator.allocate(prefix, block=block)
+            subnet_name = "%s-%d-pod-subnet" % (self.name, az_index)
+            subnet = ec2.Subnet(subnet_name, availability_zone_id=self._get_az(az_index), cidr_block=cidr, vpc_id=vpcid,
+                                tags=self.vpc_tags, map_public_ip_on_launch=False, opts=self._subnet_opts(cidr))
+            ec2.RouteTableAssociation("%s-rt-assoc" % subnet_name, route_table_id=self._get_private_route_table(vpcid, az_index),
+                                      subnet_id=subnet.id, opts=ResourceOptions(parent=self))
+            self.pod_subnets[zone_names[az_index]] = subnet.id
+            self.pod_subnet_cidrs[zone_names[az_index]] = cidr
+
+    def _create_private_subnet(self, vpcid, private_route_table_id, index, az_index, cidr):
         if private_route_table_id is None:
             raise RunError("attempting to create a private subnet without a private subnet route table")
 
-        subnet_name = "%s-%d-private-subnet" % (self.name, azid)
-        az_id = self._get_az(azid)
-        subnet = ec2.Subnet(subnet_name, availability_zone_id=az_id, cidr_block=("10.0.%d.0/24" % azid), vpc_id=vpcid, tags=self.vpc_tags,
-                            map_public_ip_on_launch=False, __opts__= ResourceOptions(parent=self))
+        subnet_name = "%s-%d-private-subnet" % (self.name, index)
+        az_id = self._get_az(az_index)
+        subnet = ec2.Subnet(subnet_name, availability_zone_id=az_id, cidr_block=cidr, vpc_id=vpcid, tags=self.vpc_tags,
+                            map_public_ip_on_launch=False, opts=self._subnet_opts(cidr))
 
         prta_name = "%s-rt-assoc" % subnet_name
-        private_route_table_assocation = ec2.RouteTableAssociation(prta_name, route_table_id=private_route_table_id, subnet_id=subnet.id, __opts__=ResourceOptions(parent=self))
+        private_route_table_assocation = ec2.RouteTableAssociation(prta_name, route_table_id=private_route_table_id, subnet_id=subnet.id, opts=ResourceOptions(parent=self))
         return subnet.id
 
+    def _create_vpc_endpoints(self, vpcid, services):
+        region = self.region or Lookup.get_region_name()
+        route_table_ids = [self.public_route_table_id] + list(self.private_route_tables.values())
+
+        # an interface endpoint takes at most one subnet per availability zone
+        endpoint_subnets = []
+        endpoint_azs = set()
+        for subnet_id, az_index in zip(self.private_subnets, self.private_subnet_azs):
+            if az_index not in endpoint_azs:
+                endpoint_azs.add(az_index)
+                endpoint_subnets.append(subnet_id)
+
+        endpoint_sg = None
+        for service in services:
+            endpoint_name = "%s-%s-endpoint" % (self.name, service.replace(".", "-"))
+            service_name = "com.amazonaws.%s.%s" % (region, service)
+            if service in GATEWAY_ENDPOINT_SERVICES:
+                endpoint = ec2.VpcEndpoint(endpoint_name, vpc_id=vpcid, service_name=service_name, vpc_endpoint_type="Gateway",
+                                           route_table_ids=route_table_ids, tags=self.vpc_tags, opts=ResourceOptions(parent=self))
+            else:
+                if endpoint_sg is None:
+                    endpoint_sg = self._create_endpoint_security_group(vpcid)
+                endpoint = ec2.VpcEndpoint(endpoint_name, vpc_id=vpcid, service_name=service_name, vpc_endpoint_type="Interface",
+                                           subnet_ids=endpoint_subnets, security_group_ids=[endpoint_sg], private_dns_enabled=True,
+                                           tags=self.vpc_tags, opts=ResourceOptions(parent=self))
+            self.vpc_endpoints[service] = endpoint.id
+
+    def _create_endpoint_security_group(self, vpcid):
+        # interface endpoints only answer HTTPS from inside the vpc
+        rules = RuleSet(vpcid, tags=self.sg_tags, parent=self).group("endpoints", "%s-endpoints-sg" % self.name)
+        rules.ingress("endpoints", protocol="tcp", from_port=443, to_port=443, cidr_blocks=[self.cidr_block] + self.secondary_cidr_blocks,
+                      description="https to the vpc endpoints from the vpc", alias="%s-endpoints-ingress-https" % self.name)
+        return rules.build()["endpoints"]
+
     def _create_security_groups(self, vpcid):
         pub_name = "%s-public-sg" % self.name
-        public_sg = ec2.SecurityGroup(pub_name, description=pub_name, vpc_id=vpcid, tags=self.sg_tags, __opts__= ResourceOptions(parent=self))
-
         priv_name = "%s-private-sg" % self.name
-        private_sg = ec2.SecurityGroup(priv_name, description=priv_name, vpc_id=vpcid, tags=self.sg_tags, __opts__= ResourceOptions(parent=self))
+        rules = RuleSet(vpcid, tags=self.sg_tags, parent=self)
+        rules.group("public", pub_name).group("private", priv_name)
+        # the rules keep the names they had before the RuleSet, so existing stacks do not replace them
 
         """
         Set up public rules:
@@ -155,38 +315,21 @@ class Network(ComponentResource):
             3. egress rule for all
             4. ingress rule for current IP address on 22
         """
-        pub_ingress_itself = ec2.SecurityGroupRule("public-ingress-from-itself", type="ingress", from_port=0, to_port=0,
-                                                   protocol=-1, security_group_id=public_sg.id, self=True, description="public ingress to/from itself",
-                                                   __opts__= ResourceOptions(parent=self))
-
-        pub_ingress_private = ec2.SecurityGroupRule("public-ingress-from-private", type="ingress", from_port=0, to_port=0,
-                                                    protocol=-1, security_group_id=public_sg.id, source_security_group_id=private_sg.id,
-                                                    description="public ingress from private", __opts__= ResourceOptions(parent=self))
-
-        pub_egress = ec2.SecurityGroupRule("public-egress", type="egress", cidr_blocks=["0.0.0.0/0"], from_port=0,
-                                           to_port=0, protocol=-1, security_group_id=public_sg.id, description="egress traffic from public sg",
-                                           __opts__= ResourceOptions(parent=self))
-
+        rules.ingress("public", itself=True, description="public ingress to/from itself", alias="public-ingress-from-itself")
+        rules.ingress("public", source="private", description="public ingress from private", alias="public-ingress-from-private")
+        rules.egress("public", cidr_blocks=["0.0.0.0/0"], description="egress traffic from public sg", alias="public-egress")
         current_ip = Util.get_workstation_ip()
-        pub_ingress_current_ip = ec2.SecurityGroupRule("public-ingress-from-current-ip", type="ingress", from_port=22, to_port=22,
-                                                       protocol="TCP", security_group_id=public_sg.id, cidr_blocks=[("%s/32" % current_ip)],
-                                                       description="ingress from current IP", __opts__= ResourceOptions(parent=self))
+        rules.ingress("public", protocol="tcp", from_port=22, to_port=22, cidr_blocks=["%s/32" % current_ip],
+                      description="ingress from current IP", alias="public-ingress-from-current-ip")
         """
         Set up private rules:
             1. ingress from public to it
             2. ingress from itself to itself
             3. egress rule for all
         """
-        priv_ingress_itself = ec2.SecurityGroupRule("private-ingress-from-itself", type="ingress", from_port=0, to_port=0,
-                                                    protocol=-1, security_group_id=private_sg.id, self=True, description="private ingress to itself",
-                                                    __opts__= ResourceOptions(parent=self))
-
-        priv_ingress_public = ec2.SecurityGroupRule("private-ingress-from-public", type="ingress", from_port=0, to_port=0,
-                                                    protocol=-1, security_group_id=private_sg.id, source_security_group_id=public_sg.id,
-                                                    description="private ingress from public", __opts__= ResourceOptions(parent=self))
-
-        priv_egress = ec2.SecurityGroupRule("private-egress", type="egress", cidr_blocks=["0.0.0.0/0"], from_port=0,
-                                            to_port=0, protocol=-1, security_group_id=private_sg.id,
-                                            description="egress traffic from private sg", __opts__= ResourceOptions(parent=self))
+        rules.ingress("private", itself=True, description="private ingress to itself", alias="private-ingress-from-itself")
+        rules.ingress("private", source="public", description="private ingress from public", alias="private-ingress-from-public")
+        rules.egress("private", cidr_blocks=["0.0.0.0/0"], description="egress traffic from private sg", alias="private-egress")
 
-        return {"public": public_sg.id, "private": private_sg.id}
+        self.security_group_rules = rules
+        return rules.build()
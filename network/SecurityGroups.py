@@ -0,0 +1,249 @@
+"""
+Declare security groups & their rules together, then create them with as few resources as possible
+"""
+from pulumi.errors import RunError
+from pulumi.resource import Alias, ResourceOptions
+from pulumi_aws import ec2
+
+ALL_PROTOCOLS = "-1"
+
+
+class Rule(object):
+    """
+    A single ingress or egress rule. Give exactly one of cidr_blocks, source, source_security_group_id or itself.
+
+    :param type ingress or egress
+    :param protocol tcp, udp, icmp or -1 for all traffic
+    :param from_port The first port. Ignored for all traffic
+    :param to_port The last port. Ignored for all traffic
+    :param cidr_blocks A list of CIDR blocks
+    :param source The key of another group in the same RuleSet
+    :param source_security_group_id The id of a security group outside of the RuleSet
+    :param itself Allow traffic from the group itself
+    :param description A description of the rule
+    :param name A label for the rule, used in its resource name. Required with source_security_group_id
+    :param alias The resource name the rule was created with before, so an existing rule is kept rather than replaced
+    """
+    def __init__(self, type, protocol=ALL_PROTOCOLS, from_port=0, to_port=0, cidr_blocks=None, source=None,
+                 source_security_group_id=None, itself=False, description=None, name=None, alias=None):
+        if type not in ("ingress", "egress"):
+            raise RunError("Unsupported rule type %s! ingress or egress supported" % type)
+        sources = [s for s in (cidr_blocks, source, source_security_group_id, itself or None) if s is not None]
+        if len(sources) != 1:
+            raise RunError("a rule needs exactly one of cidr_blocks, source, source_security_group_id or itself")
+        if source_security_group_id is not None and name is None:
+            raise RunError("a rule with a source_security_group_id needs a name")
+
+        self.type = type
+        self.protocol = str(protocol).lower()
+        if self.protocol in ("-1", "all"):
+            self.protocol = ALL_PROTOCOLS
+            from_port, to_port = 0, 0
+        self.from_port = from_port
+        self.to_port = to_port
+        self.cidr_blocks = sorted(set(cidr_blocks)) if cidr_blocks is not None else None
+        self.source = source
+        self.source_security_group_id = source_security_group_id
+        self.itself = itself
+        self.description = description
+        self.name = name
+        self.alias = alias
+
+    @property
+    def ports(self):
+        if self.protocol == ALL_PROTOCOLS:
+            return "all"
+        if self.from_port == self.to_port:
+            return "%s-%d" % (self.protocol, self.from_port)
+        return "%s-%d-%d" % (self.protocol, self.from_port, self.to_port)
+
+    @property
+    def source_label(self):
+        if self.cidr_blocks is not None:
+            return "cidr"
+        if self.itself:
+            return "self"
+        if self.source is not None:
+            return self.source
+        return self.name
+
+    @property
+    def key(self):
+        """
+        Rules with the same key do the same thing. CIDR rules are keyed by ports only, so they merge. Rules from a group
+        outside the RuleSet are keyed by its id too - an Output id only matches the same Output
+        """
+        return (self.type, self.ports, self.source_label, self.source_security_group_id)
+
+    def describe(self):
+        """
+        A plain description of the rule, for diffs
+        """
+        source = ",".join(self.cidr_blocks) if self.cidr_blocks is not None else self.source_label
+        return "%s %s %s" % (self.type, self.ports, source)
+
+
+class RuleSet(object):
+    """
+    Collect security groups & rules, merge & dedupe the rules, then create the groups.
+
+    Rules from CIDR blocks with the same type & ports merge into one rule. Identical rules are dropped. A group gets one
+    SecurityGroupRule per merged rule, unless it is declared inline & its rules only reference itself, CIDR blocks,
+    groups outside the RuleSet or groups created with separate rules - then it gets one resource for the group & all its
+    rules. Groups are never given both, as the provider would fight over the rules. Moving an existing group to inline
+    rules deletes its SecurityGroupRules after the inline rules are added, which revokes them, so only new groups should
+    be declared inline.
+
+    :param vpc_id The vpc to create the groups in
+    :param tags Tags to attach to every group
+    :param parent The component the resources belong to
+    """
+    def __init__(self, vpc_id, tags=None, parent=None):
+        self.vpc_id = vpc_id
+        self.tags = tags
+        self.parent = parent
+        self._groups = {}
+        self._rules = {}
+
+    def group(self, key, name, description=None, inline=False, alias=None):
+        """
+        Declare a group
+
+        :param key The key rules use to refer to the group
+        :param name The resource name of the group
+        :param inline Give the group its rules inline when its references allow it
+        :param alias The resource name the group was created with before, so an existing group is kept
+        """
+        self._groups[key] = {"name": name, "description": description or name, "inline": inline, "alias": alias}
+        self._rules[key] = []
+        return self
+
+    def add(self, key, rule):
+        if key not in self._groups:
+            raise RunError("no security group %s declared" % key)
+        if rule.source is not None and rule.source not in self._groups:
+            raise RunError("rule source %s is not a declared security group" % rule.source)
+        self._rules[key].append(rule)
+        return self
+
+    def ingress(self, key, **kwargs):
+        return self.add(key, Rule("ingress", **kwargs))
+
+    def egress(self, key, **kwargs):
+        return self.add(key, Rule("egress", **kwargs))
+
+    def rules(self, key):
+        """
+        Return the merged & deduped rules of a group, in the order first declared
+        """
+        merged = {}
+        for rule in self._rules[key]:
+            existing = merged.get(rule.key)
+            if existing is None:
+                merged[rule.key] = rule
+            elif rule.cidr_blocks is not None:
+                descriptions = [d for d in (existing.description, rule.description) if d]
+                merged[rule.key] = Rule(rule.type, protocol=rule.protocol, from_port=rule.from_port, to_port=rule.to_port,
+                                        cidr_blocks=existing.cidr_blocks + rule.cidr_blocks,
+                                        description="; ".join(sorted(set(descriptions))) or None,
+                                        alias=existing.alias or rule.alias)
+        return list(merged.values())
+
+    def inline_groups(self):
+        """
+        Return the keys of the groups that get their rules inline. A group referencing another can only be inline
+        when the group it references is not, or the two could never be created
+        """
+        inline = []
+        for key, group in self._groups.items():
+            if not group["inline"]:
+                continue
+            references = set(r.source for r in self._rules[key] if r.source is not None and r.source != key)
+            referenced_by_inline = any(key == r.source for other in inline for r in self._rules[other])
+            if not references.intersection(inline) and not referenced_by_inline:
+                inline.append(key)
+        return inline
+
+    def plan(self):
+        """
+        Return the groups & rules that would be created, as plain data. Two plans can be compared with diff
+        """
+        inline = self.inline_groups()
+        return dict((key, {"inline": key in inline, "rules": sorted(r.describe() for r in self.rules(key))})
+                    for key in self._groups)
+
+    def build(self):
+        """
+        Create the groups & rules. Returns the group ids keyed by group key
+        """
+        inline = self.inline_groups()
+        groups = {}
+
+        # groups with separate rules first - inline groups may need their ids
+        for key, group in self._groups.items():
+            if key not in inline:
+                groups[key] = ec2.SecurityGroup(group["name"], description=group["description"], vpc_id=self.vpc_id,
+                                                tags=self.tags, opts=self._opts(group["alias"]))
+        for key in inline:
+            group = self._groups[key]
+            rules = self.rules(key)
+            groups[key] = ec2.SecurityGroup(group["name"], description=group["description"], vpc_id=self.vpc_id, tags=self.tags,
+                                            ingress=[self._inline_rule(r, groups) for r in rules if r.type == "ingress"],
+                                            egress=[self._inline_rule(r, groups) for r in rules if r.type == "egress"],
+                                            opts=self._opts(group["alias"]))
+
+        for key, group in self._groups.items():
+            if key in inline:
+                continue
+            for rule_name, rule in self._rule_names(group["name"], self.rules(key)):
+                source_id = groups[rule.source].id if rule.source is not None else rule.source_security_group_id
+                ec2.SecurityGroupRule(rule_name, type=rule.type, protocol=rule.protocol, from_port=rule.from_port,
+                                      to_port=rule.to_port, security_group_id=groups[key].id, cidr_blocks=rule.cidr_blocks,
+                                      source_security_group_id=source_id, self=rule.itself or None,
+                                      description=rule.description, opts=self._opts(rule.alias))
+
+        return dict((key, group.id) for key, group in groups.items())
+
+    def _opts(self, alias):
+        return ResourceOptions(parent=self.parent, aliases=[Alias(name=alias)] if alias is not None else None)
+
+    def _rule_names(self, group_name, rules):
+        """
+        Name the separate rules of a group. Rules from different outside groups may share a name, so those are told
+        apart by the id of their group rather than by the order they were declared in, which would rename rules
+        """
+        names = ["%s-%s-%s-%s" % (group_name, rule.type, rule.ports, rule.source_label) for rule in rules]
+        unique = []
+        for name, rule in zip(names, rules):
+            if names.count(name) > 1:
+                if not isinstance(rule.source_security_group_id, str):
+                    raise RunError("rules from security groups whose ids are not known yet need different names. %s entered"
+                                   % rule.name)
+                name = "%s-%s" % (name, rule.source_security_group_id)
+            unique.append((name, rule))
+        return unique
+
+    def _inline_rule(self, rule, groups):
+        inline_rule = {"protocol": rule.protocol, "from_port": rule.from_port, "to_port": rule.to_port}
+        if rule.description:
+            inline_rule["description"] = rule.description
+        if rule.cidr_blocks is not None:
+            inline_rule["cidr_blocks"] = rule.cidr_blocks
+        elif rule.itself:
+            inline_rule["self"] = True
+        elif rule.source is not None:
+            inline_rule["security_groups"] = [groups[rule.source].id]
+        else:
+            inline_rule["security_groups"] = [rule.source_security_group_id]
+        return inline_rule
+
+
+def diff(before, after):
+    """
+    Compare two RuleSet plans. Returns the rules added & removed, each prefixed with its group key
+    """
+    def flatten(plan):
+        return set("%s: %s" % (key, rule) for key, group in plan.items() for rule in group["rules"])
+
+    old, new = flatten(before), flatten(after)
+    return {"added": sorted(new - old), "removed": sorted(old - new)}
@@ -1,3 +1,11 @@
 """
 Builds a VPC in aws
-"""
\ No newline at end of file
+"""
+import util.Lazy as Lazy
+
+Lazy.exports(__name__, {
+    "NetworkMesh": "network.Mesh",
+    "CidrAllocator": "network.Cidr",
+    "Rule": "network.SecurityGroups",
+    "RuleSet": "network.SecurityGroups",
+})
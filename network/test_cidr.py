@@ -0,0 +1,47 @@
+from unittest import TestCase
+
+from pulumi.errors import RunError
+
+from network.Cidr import CidrAllocator, overlapping
+
+
+class TestCidrAllocator(TestCase):
+
+    def test_allocates_in_order(self):
+        allocator = CidrAllocator("10.0.0.0/16")
+        self.assertEqual(["10.0.0.0/24", "10.0.1.0/24", "10.0.2.0/24"], [allocator.allocate(24) for _ in range(3)])
+
+    def test_aligns_mixed_sizes_and_fills_gaps(self):
+        allocator = CidrAllocator("10.0.0.0/16")
+        self.assertEqual("10.0.0.0/24", allocator.allocate(24))
+        self.assertEqual("10.0.16.0/20", allocator.allocate(20))
+        self.assertEqual("10.0.1.0/24", allocator.allocate(24))
+        self.assertEqual("10.0.2.0/23", allocator.allocate(23))
+
+    def test_reserve_detects_overlaps(self):
+        allocator = CidrAllocator("10.0.0.0/16")
+        allocator.allocate(20)
+        self.assertEqual(["10.0.0.0/20"], allocator.overlaps("10.0.4.0/24"))
+        with self.assertRaises(RunError):
+            allocator.reserve("10.0.8.0/22")
+        with self.assertRaises(RunError):
+            allocator.reserve("10.1.0.0/24")
+        self.assertEqual("10.0.16.0/24", allocator.reserve("10.0.16.0/24"))
+
+    def test_secondary_blocks(self):
+        allocator = CidrAllocator("10.0.0.0/24", ["100.64.0.0/16"])
+        self.assertEqual("10.0.0.0/24", allocator.allocate(24))
+        self.assertEqual("100.64.0.0/24", allocator.allocate(24))
+        self.assertEqual("100.64.16.0/20", allocator.allocate(20, block="100.64.0.0/16"))
+
+    def test_exhaustion(self):
+        allocator = CidrAllocator("10.0.0.0/23")
+        allocator.allocate(24)
+        allocator.allocate(24)
+        with self.assertRaises(RunError):
+            allocator.allocate(24)
+
+    def test_overlapping_blocks(self):
+        self.assertEqual([("10.0.0.0/16", "10.0.128.0/17")], overlapping(["10.0.128.0/17", "10.1.0.0/16", "10.0.0.0/16"]))
+        with self.assertRaises(RunError):
+            CidrAllocator("10.0.0.0/16", ["10.0.0.0/8"])
@@ -0,0 +1,82 @@
+import os
+from unittest import TestCase
+
+from pulumi.errors import RunError
+
+import bench.Mocks as Mocks
+from network.Mesh import NetworkMesh
+
+
+class TestNetworkMesh(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        os.environ.setdefault("PAVE_WORKSTATION_IP", Mocks.WORKSTATION_IP)
+
+    def build(self, **kwargs):
+        meshes = []
+        monitor = Mocks.run(lambda: meshes.append(NetworkMesh("mesh", **kwargs)))
+        return meshes[0], monitor
+
+    def names(self, monitor, type):
+        return sorted(r["name"] for r in monitor.registrations if r["type"] == type)
+
+    def test_vpcs_do_not_overlap(self):
+        mesh, monitor = self.build(vpcs=[{"name": "a", "subnet_count": 3}, {"name": "b", "subnet_count": 3, "prefix": 15},
+                                         {"name": "c", "subnet_count": 3, "cidr_block": "10.0.0.0/16"}])
+        self.assertEqual({"a": "10.1.0.0/16", "b": "10.2.0.0/15", "c": "10.0.0.0/16"}, mesh.cidr_blocks)
+        self.assertEqual(["10.2.0.0/24"], mesh.networks["b"].public_subnet_cidrs)
+        self.assertEqual(3, len(self.names(monitor, "aws:ec2/vpc:Vpc")))
+
+    def test_vpcs_attach_to_one_transit_gateway(self):
+        mesh, monitor = self.build(vpcs=[{"name": "a", "subnet_count": 5, "public_subnet_count": 2, "az_count": 2},
+                                         {"name": "b", "subnet_count": 3}])
+        self.assertEqual(["mesh-tgw"], self.names(monitor, "aws:ec2transitgateway/transitGateway:TransitGateway"))
+        self.assertEqual(["a-tgw-rt-propagation", "b-tgw-rt-propagation"],
+                         self.names(monitor, "aws:ec2transitgateway/routeTablePropagation:RouteTablePropagation"))
+        attachments = dict((r["name"], monitor.resources[r["urn"]].state) for r in monitor.registrations
+                           if r["type"] == "aws:ec2transitgateway/vpcAttachment:VpcAttachment")
+        # one subnet per availability zone
+        self.assertEqual(2, len(attachments["a-tgw-attachment"]["subnetIds"]))
+        routes = [monitor.resources[r["urn"]].state for r in monitor.registrations
+                  if r["type"] == "aws:ec2/route:Route" and r["name"].endswith("-mesh-route")]
+        self.assertEqual(4, len(routes))
+        self.assertEqual({"10.0.0.0/8"}, set(route["destinationCidrBlock"] for route in routes))
+
+    def test_route_tables_have_no_inline_routes(self):
+        # aws does not allow inline routes on a route table that also has separate Route resources
+        mesh, monitor = self.build(vpcs=[{"name": "a", "subnet_count": 3}, {"name": "b", "subnet_count": 3}])
+        route_tables = [monitor.resources[r["urn"]].state for r in monitor.registrations
+                        if r["type"] == "aws:ec2/routeTable:RouteTable"]
+        self.assertTrue(route_tables)
+        self.assertEqual([], [rt["routes"] for rt in route_tables if rt.get("routes")])
+        default_routes = self.names(monitor, "aws:ec2/route:Route")
+        self.assertIn("a-public-rt-default-route", default_routes)
+        self.assertIn("a-private-rt-default-route", default_routes)
+
+    def test_regions_are_peered(self):
+        mesh, monitor = self.build(vpcs=[{"name": "a", "subnet_count": 3},
+                                         {"name": "b", "subnet_count": 3, "region": "us-west-2"}])
+        self.assertEqual(["mesh-us-west-2"], self.names(monitor, "pulumi:providers:aws"))
+        self.assertEqual(["mesh-tgw", "mesh-us-west-2-tgw"],
+                         self.names(monitor, "aws:ec2transitgateway/transitGateway:TransitGateway"))
+        self.assertEqual(["mesh-us-east-1-us-west-2-tgw-peering"],
+                         self.names(monitor, "aws:ec2transitgateway/peeringAttachment:PeeringAttachment"))
+        routes = dict((r["name"], monitor.resources[r["urn"]].state) for r in monitor.registrations
+                      if r["type"] == "aws:ec2transitgateway/route:Route")
+        self.assertEqual("10.1.0.0/16", routes["mesh-b-tgw-route"]["destinationCidrBlock"])
+        self.assertEqual("10.0.0.0/16", routes["mesh-us-west-2-a-tgw-route"]["destinationCidrBlock"])
+
+    def test_the_current_region_is_not_peered_with_itself(self):
+        mesh, monitor = self.build(vpcs=[{"name": "a", "subnet_count": 3},
+                                         {"name": "b", "subnet_count": 3, "region": "us-east-1"}])
+        self.assertEqual([None], list(mesh.transit_gateways))
+        self.assertEqual([], self.names(monitor, "pulumi:providers:aws"))
+
+    def test_needs_unique_names(self):
+        with self.assertRaises(RunError):
+            self.build(vpcs=[{"name": "a", "subnet_count": 3}, {"name": "a", "subnet_count": 3}])
+
+    def test_address_space_too_small(self):
+        with self.assertRaises(RunError):
+            self.build(address_space="10.0.0.0/16", vpcs=[{"name": "a", "subnet_count": 3}, {"name": "b", "subnet_count": 3}])
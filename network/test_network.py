@@ -0,0 +1,90 @@
+import os
+from unittest import TestCase
+
+from pulumi.errors import RunError
+
+import bench.Mocks as Mocks
+from network.Network import Network
+
+
+class TestNetwork(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        os.environ.setdefault("PAVE_WORKSTATION_IP", Mocks.WORKSTATION_IP)
+
+    def build(self, **kwargs):
+        networks = []
+        monitor = Mocks.run(lambda: networks.append(Network("network", **kwargs)))
+        return networks[0], monitor
+
+    def subnets(self, monitor):
+        return dict((r["name"], r) for r in monitor.registrations if r["type"] == "aws:ec2/subnet:Subnet")
+
+    def test_default_layout_is_unchanged(self):
+        network, _ = self.build(subnet_count=3)
+        self.assertEqual(["10.0.0.0/24"], network.public_subnet_cidrs)
+        self.assertEqual(["10.0.1.0/24", "10.0.2.0/24"], network.private_subnet_cidrs)
+        self.assertEqual([1, 2], network.private_subnet_azs)
+
+    def test_many_azs_with_larger_private_subnets(self):
+        network, monitor = self.build(subnet_count=8, public_subnet_count=4, az_count=4, private_subnet_prefix=20)
+        self.assertEqual(["10.0.0.0/24", "10.0.1.0/24", "10.0.2.0/24", "10.0.3.0/24"], network.public_subnet_cidrs)
+        self.assertEqual(["10.0.16.0/20", "10.0.32.0/20", "10.0.48.0/20", "10.0.64.0/20"], network.private_subnet_cidrs)
+        self.assertEqual([0, 1, 2, 3], network.private_subnet_azs)
+        self.assertEqual(8, len(self.subnets(monitor)))
+
+    def test_private_subnets_in_a_secondary_block(self):
+        network, monitor = self.build(subnet_count=3, secondary_cidr_blocks=["100.64.0.0/16"],
+                                      private_subnet_prefix=18, private_subnet_cidr_block="100.64.0.0/16")
+        self.assertEqual(["100.64.0.0/18", "100.64.64.0/18"], network.private_subnet_cidrs)
+        types = [r["type"] for r in monitor.registrations]
+        self.assertIn("aws:ec2/vpcIpv4CidrBlockAssociation:VpcIpv4CidrBlockAssociation", types)
+
+    def test_pod_subnets_per_zone_in_a_secondary_block(self):
+        network, monitor = self.build(subnet_count=6, public_subnet_count=3, az_count=3, secondary_cidr_blocks=["100.64.0.0/16"],
+                                      pod_subnet_cidr_block="100.64.0.0/16")
+        self.assertEqual({"us-east-1a": "100.64.0.0/18", "us-east-1b": "100.64.64.0/18", "us-east-1c": "100.64.128.0/18"},
+                         network.pod_subnet_cidrs)
+        self.assertEqual(sorted(network.pod_subnet_cidrs), sorted(network.pod_subnets))
+        subnet = self.subnets(monitor)["network-1-pod-subnet"]
+        state = monitor.resources[subnet["urn"]].state
+        self.assertEqual(("use1-az2", "100.64.64.0/18"), (state["availabilityZoneId"], state["cidrBlock"]))
+        with self.assertRaises(RunError):
+            self.build(subnet_count=3, pod_subnet_cidr_block="100.64.0.0/16")
+
+    def test_az_count_beyond_the_region(self):
+        # the mocked region has 6 zones
+        with self.assertRaisesRegex(RunError, "has 6"):
+            self.build(subnet_count=14, public_subnet_count=7, az_count=7)
+
+    def test_default_az_count_stops_at_the_region(self):
+        network, _ = self.build(subnet_count=8)
+        self.assertEqual(6, network.az_count)
+        self.assertEqual([1, 2, 3, 4, 5, 0, 1], network.private_subnet_azs)
+
+    def test_needs_a_private_subnet(self):
+        with self.assertRaises(RunError):
+            self.build(subnet_count=1)
+
+    def test_nat_gateway_per_az(self):
+        network, monitor = self.build(subnet_count=6, public_subnet_count=3, az_count=3, nat_gateway_mode="per_az")
+        names = [r["name"] for r in monitor.registrations]
+        self.assertEqual(["network-0-nat", "network-1-nat", "network-2-nat"],
+                         sorted(n for n in names if n.endswith("-nat")))
+        self.assertEqual([0, 1, 2], sorted(network.private_route_tables))
+
+    def test_nat_gateway_per_az_needs_public_subnets_in_each_az(self):
+        with self.assertRaises(RunError):
+            self.build(subnet_count=3, nat_gateway_mode="per_az")
+
+    def test_vpc_endpoints(self):
+        network, monitor = self.build(subnet_count=5, public_subnet_count=2, az_count=2, vpc_endpoints=True)
+        endpoints = dict((r["name"], monitor.resources[r["urn"]].state) for r in monitor.registrations
+                         if r["type"] == "aws:ec2/vpcEndpoint:VpcEndpoint")
+        self.assertEqual(["ec2", "ecr.api", "ecr.dkr", "logs", "s3", "sts"], sorted(network.vpc_endpoints))
+        self.assertEqual("Gateway", endpoints["network-s3-endpoint"]["vpcEndpointType"])
+        self.assertEqual(2, len(endpoints["network-s3-endpoint"]["routeTableIds"]))
+        # one subnet per availability zone
+        self.assertEqual(2, len(endpoints["network-ecr-dkr-endpoint"]["subnetIds"]))
+        self.assertTrue(endpoints["network-ecr-dkr-endpoint"]["privateDnsEnabled"])
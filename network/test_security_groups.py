@@ -0,0 +1,68 @@
+from unittest import TestCase
+
+from pulumi.errors import RunError
+
+import bench.Mocks as Mocks
+from network.SecurityGroups import Rule, RuleSet, diff
+
+
+class TestRuleSet(TestCase):
+
+    def rule_set(self):
+        rules = RuleSet("vpc-id").group("public", "public-sg", inline=True).group("private", "private-sg", inline=True)
+        rules.ingress("public", source="private")
+        rules.ingress("private", source="public")
+        rules.egress("private", cidr_blocks=["0.0.0.0/0"])
+        return rules
+
+    def test_merges_cidr_rules_and_drops_duplicates(self):
+        rules = RuleSet("vpc-id").group("web", "web-sg")
+        rules.ingress("web", protocol="TCP", from_port=443, to_port=443, cidr_blocks=["10.0.0.0/16"])
+        rules.ingress("web", protocol="tcp", from_port=443, to_port=443, cidr_blocks=["10.1.0.0/16", "10.0.0.0/16"])
+        rules.ingress("web", itself=True)
+        rules.ingress("web", protocol=-1, from_port=22, to_port=22, itself=True)
+        self.assertEqual(["ingress all self", "ingress tcp-443 10.0.0.0/16,10.1.0.0/16"], rules.plan()["web"]["rules"])
+
+    def test_breaks_reference_cycles(self):
+        plan = self.rule_set().plan()
+        self.assertTrue(plan["public"]["inline"])
+        self.assertFalse(plan["private"]["inline"])
+
+    def test_groups_keep_separate_rules_unless_inline(self):
+        rules = RuleSet("vpc-id").group("web", "web-sg")
+        rules.ingress("web", itself=True, alias="web-ingress-from-itself")
+        self.assertFalse(rules.plan()["web"]["inline"])
+        monitor = Mocks.run(rules.build)
+        rule = [r for r in monitor.registrations if r["type"] == "aws:ec2/securityGroupRule:SecurityGroupRule"][0]
+        self.assertEqual(["web-ingress-from-itself"], rule["aliases"])
+
+    def test_diff(self):
+        before = self.rule_set().plan()
+        rules = self.rule_set()
+        rules.ingress("public", protocol="tcp", from_port=22, to_port=22, cidr_blocks=["192.0.2.1/32"])
+        self.assertEqual({"added": ["public: ingress tcp-22 192.0.2.1/32"], "removed": []}, diff(before, rules.plan()))
+
+    def test_rule_needs_one_source(self):
+        with self.assertRaises(RunError):
+            Rule("ingress", cidr_blocks=["0.0.0.0/0"], itself=True)
+        with self.assertRaises(RunError):
+            RuleSet("vpc-id").group("web", "web-sg").ingress("web", source="missing")
+
+    def test_rules_from_different_outside_groups_are_kept(self):
+        rules = RuleSet("vpc-id").group("web", "web-sg")
+        rules.ingress("web", source_security_group_id="sg-1", name="bastion")
+        rules.ingress("web", source_security_group_id="sg-1", name="bastion")
+        rules.ingress("web", source_security_group_id="sg-2", name="bastion")
+        self.assertEqual(["sg-1", "sg-2"], [r.source_security_group_id for r in rules.rules("web")])
+
+    def test_rule_names_do_not_depend_on_order(self):
+        def names(ids):
+            rules = RuleSet("vpc-id").group("db", "db-sg")
+            for source_id in ids:
+                rules.ingress("db", source_security_group_id=source_id, name="bastion")
+            monitor = Mocks.run(rules.build)
+            return sorted(r["name"] for r in monitor.registrations if r["type"] == "aws:ec2/securityGroupRule:SecurityGroupRule")
+
+        self.assertEqual(["db-sg-ingress-all-bastion-sg-1", "db-sg-ingress-all-bastion-sg-2"], names(["sg-1", "sg-2"]))
+        self.assertEqual(names(["sg-1", "sg-2"]), names(["sg-2", "sg-1"]))
+        self.assertEqual(["db-sg-ingress-all-bastion"], names(["sg-1"]))
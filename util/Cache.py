@@ -0,0 +1,152 @@
+"""
+A lookup cache held in memory and persisted to disk so each distinct provider lookup runs at most once per stack
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+
+DEFAULT_PATH = os.path.join(".pave", "lookup-cache.json")
+DEFAULT_TTL = 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 512
+
+# default: use stored entries younger than the ttl
+# refresh: ignore stored entries & look everything up again (still one lookup per key per process)
+# pin: use stored entries regardless of their age, only look up keys that were never stored
+# off: keep entries in memory only, never read or write the file
+MODES = ("default", "refresh", "pin", "off")
+
+
+def make_key(kind, region, account, **params):
+    """
+    Build a stable cache key from the kind of lookup, where it runs & the filters passed to it
+
+    :param kind The kind of lookup, e.g. ami
+    :param region The region the lookup runs against
+    :param account The account (or profile standing in for it) the lookup runs as
+    :param params The filters passed to the lookup. Must be json serializable
+    """
+    return json.dumps({"kind": kind, "region": region, "account": account, "params": params}, sort_keys=True)
+
+
+class LookupCache(object):
+    """
+    Cache the results of provider lookups. Values must be json serializable.
+
+    :param path The file entries are saved to. Defaults to PAVE_CACHE_PATH or .pave/lookup-cache.json
+    :param ttl Seconds a stored entry stays valid. Defaults to PAVE_CACHE_TTL or one day
+    :param max_entries The number of entries kept on disk. The least recently used entries are evicted first
+    :param mode One of MODES. Defaults to PAVE_CACHE_MODE or default
+    """
+    def __init__(self, path=None, ttl=None, max_entries=None, mode=None):
+        self.path = path or os.environ.get("PAVE_CACHE_PATH", DEFAULT_PATH)
+        self.ttl = float(ttl if ttl is not None else os.environ.get("PAVE_CACHE_TTL", DEFAULT_TTL))
+        self.max_entries = int(max_entries if max_entries is not None else DEFAULT_MAX_ENTRIES)
+        self.mode = mode or os.environ.get("PAVE_CACHE_MODE", "default")
+        if self.mode not in MODES:
+            raise ValueError("Unsupported cache mode %s. One of %s supported" % (self.mode, ", ".join(MODES)))
+
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        # keys looked up by this process - these are always valid, whatever the mode
+        self._fresh = set()
+        self._entries = self._load()
+
+    def get(self, key, lookup):
+        """
+        Return the cached value for key, calling lookup() to fill it when there is no valid entry
+        """
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # hold a per key lock so concurrent callers of the same key share a single lookup
+        with key_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and self._is_valid(key, entry):
+                    entry["used"] = time.time()
+                    self.hits += 1
+                    return entry["value"]
+
+            value = lookup()
+
+            with self._lock:
+                now = time.time()
+                self._entries[key] = {"value": value, "created": now, "used": now}
+                self._fresh.add(key)
+                self.misses += 1
+                self._save()
+            return value
+
+    def put(self, key, value):
+        """
+        Store a value looked up elsewhere, e.g. by a prefetch
+        """
+        with self._lock:
+            now = time.time()
+            self._entries[key] = {"value": value, "created": now, "used": now}
+            self._fresh.add(key)
+            self._save()
+
+    def invalidate(self, key=None):
+        """
+        Drop a single entry, or every entry when no key is given
+        """
+        with self._lock:
+            if key is None:
+                self._entries = {}
+                self._fresh = set()
+            else:
+                self._entries.pop(key, None)
+                self._fresh.discard(key)
+            self._save()
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and self._is_valid(key, entry)
+
+    def _is_valid(self, key, entry):
+        if key in self._fresh:
+            return True
+        if self.mode == "refresh":
+            return False
+        if self.mode == "pin":
+            return True
+        return time.time() - entry["created"] < self.ttl
+
+    def _load(self):
+        if self.mode == "off" or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path) as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            # a corrupt or unreadable cache is the same as an empty one
+            return {}
+        if not isinstance(entries, dict):
+            return {}
+        return entries
+
+    def _save(self):
+        if self.mode == "off":
+            return
+
+        entries = self._entries
+        if self.mode == "default":
+            entries = dict((k, v) for k, v in entries.items() if self._is_valid(k, v))
+        if len(entries) > self.max_entries:
+            newest = sorted(entries.items(), key=lambda item: item[1]["used"], reverse=True)[:self.max_entries]
+            entries = dict(newest)
+        self._entries = entries
+
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        # write to a temp file & swap it in so an interrupted run never leaves a half written cache
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".lookup-cache")
+        with os.fdopen(fd, "w") as f:
+            json.dump(entries, f, sort_keys=True, indent=1)
+        os.replace(tmp_path, self.path)
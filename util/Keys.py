@@ -0,0 +1,267 @@
+"""
+Generate key pairs off the main thread & keep them across runs in an encrypted local store, so a preview reuses the
+keys of the last run rather than generating new ones & changing user data.
+
+Keys are only stored when PAVE_KEY_PASSPHRASE is set. The store is encrypted with a key derived from it.
+"""
+import base64
+import json
+import os
+import tempfile
+import threading
+from concurrent import futures
+
+from pulumi.errors import RunError
+
+import util.Trace as Trace
+
+RSA = "rsa"
+ED25519 = "ed25519"
+ALGORITHMS = (RSA, ED25519)
+
+DEFAULT_STORE_PATH = os.path.join(".pave", "keys.json")
+KDF_ITERATIONS = 200000
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+@Trace.traced("crypto")
+def generate_keypair(algorithm=RSA):
+    """
+    Generate a key pair. Returns the OpenSSH public key & the PEM private key. RSA keys are 2048 bit PKCS8,
+    Ed25519 keys are in the OpenSSH format, the only one ssh reads them in
+
+    :param algorithm rsa or ed25519. Ed25519 keys take a fraction of the time to generate
+    """
+    # imported here so stacks that need no keys never load cryptography
+    from cryptography.hazmat.backends import default_backend
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+
+    if algorithm == RSA:
+        private_key_object = rsa.generate_private_key(public_exponent=65537, key_size=2048, backend=default_backend())
+        private_format = serialization.PrivateFormat.PKCS8
+    elif algorithm == ED25519:
+        private_key_object = ed25519.Ed25519PrivateKey.generate()
+        private_format = serialization.PrivateFormat.OpenSSH
+    else:
+        raise RunError("Unsupported key algorithm %s! %s supported" % (algorithm, ", ".join(ALGORITHMS)))
+
+    public_key_string = private_key_object.public_key().public_bytes(serialization.Encoding.OpenSSH,
+                                                                      serialization.PublicFormat.OpenSSH)
+    private_key_string = private_key_object.private_bytes(serialization.Encoding.PEM, private_format,
+                                                         serialization.NoEncryption())
+    return {'public': public_key_string.decode('utf-8'), 'private': private_key_string.decode('utf-8'),
+            'algorithm': algorithm}
+
+
+class KeyStore(object):
+    """
+    Key pairs encrypted on disk with Fernet, keyed by name. Nothing is read or written without a passphrase.
+
+    :param path The file the keys are saved to. Defaults to PAVE_KEY_STORE_PATH or .pave/keys.json
+    :param passphrase The passphrase the encryption key is derived from. Defaults to PAVE_KEY_PASSPHRASE
+    """
+    def __init__(self, path=None, passphrase=None):
+        self.path = path or os.environ.get("PAVE_KEY_STORE_PATH", DEFAULT_STORE_PATH)
+        self.passphrase = passphrase if passphrase is not None else os.environ.get("PAVE_KEY_PASSPHRASE")
+        self._lock = threading.Lock()
+        self._key_lock = threading.Lock()
+        self._fernet = None
+        self._data = None
+
+    @property
+    def enabled(self):
+        return bool(self.passphrase)
+
+    def get(self, name):
+        """
+        Return the stored key pair called name, or None
+        """
+        if not self.enabled:
+            return None
+        from cryptography.fernet import InvalidToken
+
+        with self._lock:
+            token = self._load()["keys"].get(name)
+        if token is None:
+            return None
+        try:
+            return json.loads(self._cipher().decrypt(token.encode("utf-8")).decode("utf-8"))
+        except InvalidToken:
+            raise RunError("the key %s in %s can not be decrypted. Is PAVE_KEY_PASSPHRASE the one it was stored with?"
+                           % (name, self.path))
+
+    def put(self, name, keypair):
+        if not self.enabled:
+            return
+        token = self._cipher().encrypt(json.dumps(keypair).encode("utf-8")).decode("utf-8")
+        with self._lock:
+            data = self._load()
+            data["keys"][name] = token
+            self._save(data)
+
+    def _load(self):
+        if self._data is None:
+            try:
+                with open(self.path) as f:
+                    self._data = json.load(f)
+            except (IOError, OSError, ValueError):
+                self._data = {"salt": base64.b64encode(os.urandom(16)).decode("utf-8"), "keys": {}}
+        return self._data
+
+    def _cipher(self):
+        # the key derivation is slow on purpose, so it runs once & without the lock, which only guards the file
+        with self._key_lock:
+            if self._fernet is None:
+                from cryptography.fernet import Fernet
+                from cryptography.hazmat.primitives import hashes
+                from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+
+                with self._lock:
+                    salt = base64.b64decode(self._load()["salt"])
+                kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=salt, iterations=KDF_ITERATIONS)
+                self._fernet = Fernet(base64.urlsafe_b64encode(kdf.derive(self.passphrase.encode("utf-8"))))
+        return self._fernet
+
+    def _save(self, data):
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        handle, temp_path = tempfile.mkstemp(dir=directory, prefix=".keys-")
+        try:
+            with os.fdopen(handle, "w") as f:
+                json.dump(data, f, indent=1, sort_keys=True)
+            os.chmod(temp_path, 0o600)
+            os.replace(temp_path, self.path)
+        except Exception:
+            os.remove(temp_path)
+            raise
+
+
+class KeyProvider(object):
+    """
+    Hand out named key pairs. A stored key pair is returned as is. Otherwise one is generated in the background,
+    so it can be requested early & only waited on when it is used.
+
+    :param store A KeyStore. Defaults to one configured from the environment
+    :param max_workers The number of keys generated at once
+    :param processes Generate in a process pool rather than a thread pool, so RSA generation never holds the GIL
+    """
+    def __init__(self, store=None, max_workers=2, processes=False):
+        self.store = store if store is not None else KeyStore()
+        self.max_workers = max_workers
+        self.processes = processes
+        self._lock = threading.Lock()
+        self._requests = {}
+        self._executor = None
+
+    def request(self, name, algorithm=RSA):
+        """
+        Start getting the key pair called name. Returns a concurrent.futures.Future of it
+        """
+        if algorithm not in ALGORITHMS:
+            raise RunError("Unsupported key algorithm %s! %s supported" % (algorithm, ", ".join(ALGORITHMS)))
+        with self._lock:
+            future = self._requested(name, algorithm)
+            if future is not None:
+                return future
+
+        # decrypting derives the store's key, which is slow, so other requests are not held up meanwhile
+        stored = self.store.get(name)
+
+        with self._lock:
+            # requested by another thread while the store was read
+            future = self._requested(name, algorithm)
+            if future is not None:
+                return future
+            future = futures.Future()
+            if stored is not None and stored.get("algorithm", RSA) == algorithm:
+                future.set_result(stored)
+            else:
+                # only resolved once stored, so the next run finds the key
+                self._submit(algorithm).add_done_callback(lambda generated: self._store(name, generated, future))
+            self._requests[name] = (algorithm, future)
+            return future
+
+    def _requested(self, name, algorithm):
+        requested = self._requests.get(name)
+        if requested is None:
+            return None
+        if requested[0] != algorithm:
+            raise RunError("the key %s was requested as %s, not %s" % (name, requested[0], algorithm))
+        return requested[1]
+
+    def get(self, name, algorithm=RSA):
+        """
+        Return the key pair called name, waiting for it to be generated
+        """
+        return self.request(name, algorithm).result()
+
+    def output(self, name, algorithm=RSA):
+        """
+        Return the key pair called name as a secret Output, so resources can be declared before it is generated &
+        the private key is encrypted in the state
+        """
+        import asyncio
+        from pulumi import Output
+
+        future = self.request(name, algorithm)
+
+        async def wait():
+            return await asyncio.wrap_future(future)
+        return Output.secret(wait())
+
+    def _store(self, name, generated, future):
+        try:
+            keys = generated.result()
+            self.store.put(name, keys)
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            future.set_result(keys)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _submit(self, algorithm):
+        if self._executor is None:
+            if self.processes:
+                import multiprocessing
+                # spawn rather than fork - the engine's grpc threads do not survive a fork
+                self._executor = futures.ProcessPoolExecutor(self.max_workers, multiprocessing.get_context("spawn"))
+            else:
+                self._executor = futures.ThreadPoolExecutor(self.max_workers, thread_name_prefix="pave-keys")
+        return self._executor.submit(generate_keypair, algorithm)
+
+
+def get_provider():
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = KeyProvider()
+        return _provider
+
+
+def set_provider(provider):
+    """
+    Replace the shared provider, e.g. with one using a different store or a process pool
+    """
+    global _provider
+    _provider = provider
+
+
+def request_keypair(name, algorithm=RSA):
+    """
+    Start generating the key pair called name with the shared provider. Call early, use it later with keypair
+    """
+    return get_provider().request(name, algorithm)
+
+
+def keypair(name, algorithm=RSA):
+    """
+    Return the key pair called name from the shared provider
+    """
+    return get_provider().get(name, algorithm)
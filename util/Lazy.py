@@ -0,0 +1,42 @@
+"""
+Expose a package's classes without importing their modules, & the SDKs behind them, until first use
+"""
+import importlib
+import importlib.util
+import sys
+import types
+
+
+class _LazyPackage(types.ModuleType):
+    """
+    A package whose exports are imported on first access. Importing a submodule binds it on its package as usual, so
+    an export never shares its name with a module - network.Network is the module, the class is imported from it
+    """
+    def __getattr__(self, name):
+        exports = self.__dict__.get("_exports", {})
+        if name not in exports:
+            raise AttributeError("module %r has no attribute %r" % (self.__name__, name))
+        value = getattr(importlib.import_module(exports[name]), name)
+        super().__setattr__(name, value)
+        return value
+
+    def __dir__(self):
+        return sorted(set(super().__dir__()) | set(self._exports))
+
+
+def exports(package, names):
+    """
+    Make the names of a package load from their modules on first access
+
+        exports(__name__, {"NetworkMesh": "network.Mesh"})
+
+    :param package The name of the package, i.e. __name__ in its __init__.py
+    :param names A dictionary of exported name to the module defining it. A name can not be a module of the package
+    """
+    modules = [name for name in names if importlib.util.find_spec("%s.%s" % (package, name)) is not None]
+    if modules:
+        raise ImportError("%s can not export %s, the name of its module" % (package, ", ".join(sorted(modules))))
+    module = sys.modules[package]
+    module._exports = dict(names)
+    module.__all__ = sorted(names)
+    module.__class__ = _LazyPackage
@@ -0,0 +1,211 @@
+"""
+Provider lookups shared by the components. Each distinct lookup is made at most once & cached on disk.
+"""
+import os
+
+import pulumi
+from pulumi.errors import RunError
+import pulumi_aws
+
+from util.Cache import LookupCache, make_key
+import util.Trace as Trace
+import util.Util as Util
+
+AMAZON_LINUX_AMI = "amzn-ami-hvm-*"
+AMAZON_LINUX_2023_AMI = "al2023-ami-2023.*-x86_64"
+# the Amazon Linux 2023 AMI name filter of each architecture
+AMAZON_LINUX_2023_AMIS = {"x86_64": AMAZON_LINUX_2023_AMI, "arm64": "al2023-ami-2023.*-arm64"}
+
+_cache = None
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        # offline runs can only use what was stored, however old it is
+        _cache = LookupCache(mode="pin" if Util.is_offline() and "PAVE_CACHE_MODE" not in os.environ else None)
+    return _cache
+
+
+def set_cache(cache):
+    """
+    Replace the shared cache, e.g. with one in pin or refresh mode
+    """
+    global _cache
+    _cache = cache
+
+
+def get_region():
+    region = pulumi.Config("aws").get("region")
+    return region or os.environ.get("AWS_REGION") or os.environ.get("AWS_DEFAULT_REGION") or "default"
+
+
+def get_account():
+    # the account id is itself a lookup so the profile stands in for it unless set explicitly
+    account = os.environ.get("PAVE_AWS_ACCOUNT") or pulumi.Config("aws").get("profile")
+    return account or os.environ.get("AWS_PROFILE") or "default"
+
+
+def eks_node_ami_filter(version):
+    # remove the Patch from the version - its not used in AMI ids
+    major_minor = ".".join(version.split('.')[:2])
+    return "amazon-eks-node-%s-v*" % major_minor
+
+
+def _online(description, lookup):
+    def run():
+        _check_online(description)
+        return lookup()
+    return run
+
+
+def _check_online(description):
+    if Util.is_offline():
+        raise RunError("PAVE_OFFLINE is set & %s is not cached. Run once online to cache it" % description)
+
+
+def _ami_key(name_filter, owners, filters):
+    # the original key is kept when there are no other filters, so existing cache entries still match
+    key_args = {"name": name_filter, "owners": owners}
+    if filters:
+        key_args["filters"] = filters
+    return make_key("ami", get_region(), get_account(), **key_args)
+
+
+def _ami_filters(name_filter, filters):
+    return [{"name": "name", "values": [name_filter]}] + [{"name": name, "values": filters[name]} for name in sorted(filters)]
+
+
+def get_ami_id(name_filter, owners=None, filters=None):
+    """
+    Return the id of the most recent AMI with a name matching name_filter
+
+    :param name_filter The AMI name filter, e.g. amzn-ami-hvm-*
+    :param owners A list of AMI owners. Defaults to amazon
+    :param filters A dictionary of other AMI filters to their values, e.g. {"ena-support": ["true"]}
+    """
+    owners = owners or ["amazon"]
+    filters = filters or {}
+
+    def lookup():
+        with Trace.span("get_ami", "invoke", name=name_filter):
+            ami = pulumi_aws.ec2.get_ami(most_recent=True, owners=owners, filters=_ami_filters(name_filter, filters))
+        return ami.id
+
+    return get_cache().get(_ami_key(name_filter, owners, filters), _online("the %s AMI" % name_filter, lookup))
+
+
+async def fetch_ami_id(name_filter, owners=None, filters=None):
+    """
+    As get_ami_id, but without blocking, so several lookups run at once. The id is cached for get_ami_id
+    """
+    owners = owners or ["amazon"]
+    filters = filters or {}
+
+    def invoke():
+        return pulumi_aws.ec2.get_ami_output(most_recent=True, owners=owners, filters=_ami_filters(name_filter, filters)).id
+
+    return await _fetch(_ami_key(name_filter, owners, filters), "the %s AMI" % name_filter, invoke,
+                        lambda: get_ami_id(name_filter, owners, filters))
+
+
+def get_availability_zone_ids(region=None, provider=None):
+    """
+    Return the ids of the availability zones in a region
+
+    :param region The region. Defaults to the current region
+    :param provider The aws provider for the region, when it is not the current region
+    """
+    region = region or get_region()
+    key = make_key("availability_zones", region, get_account())
+
+    def lookup():
+        opts = pulumi.InvokeOptions(provider=provider) if provider is not None else None
+        with Trace.span("get_availability_zones", "invoke", region=region):
+            return list(pulumi_aws.get_availability_zones(opts=opts).zone_ids)
+
+    return get_cache().get(key, _online("the %s availability zone list" % region, lookup))
+
+
+def get_availability_zone_names(region=None, provider=None):
+    """
+    Return the names of the availability zones in a region, e.g. us-east-1a, in the order of get_availability_zone_ids
+
+    :param region The region. Defaults to the current region
+    :param provider The aws provider for the region, when it is not the current region
+    """
+    region = region or get_region()
+    key = make_key("availability_zone_names", region, get_account())
+
+    def lookup():
+        opts = pulumi.InvokeOptions(provider=provider) if provider is not None else None
+        with Trace.span("get_availability_zones", "invoke", region=region):
+            return list(pulumi_aws.get_availability_zones(opts=opts).names)
+
+    return get_cache().get(key, _online("the %s availability zone list" % region, lookup))
+
+
+async def fetch_availability_zone_ids(region=None, provider=None):
+    """
+    As get_availability_zone_ids, but without blocking, so several lookups run at once. The ids are cached for
+    get_availability_zone_ids
+    """
+    key = make_key("availability_zones", region or get_region(), get_account())
+
+    def invoke():
+        opts = pulumi.InvokeOptions(provider=provider) if provider is not None else None
+        return pulumi_aws.get_availability_zones_output(opts=opts).zone_ids
+
+    zone_ids = await _fetch(key, "the %s availability zone list" % (region or get_region()), invoke,
+                            lambda: get_availability_zone_ids(region, provider))
+    return list(zone_ids)
+
+
+async def _fetch(key, description, invoke, get):
+    # an entry that is already cached is read the usual way
+    if key in get_cache():
+        return get()
+    _check_online(description)
+    value = await invoke().future()
+    get_cache().put(key, value)
+    return value
+
+
+def get_instance_type(instance_type):
+    """
+    Return the network limits & architectures of an instance type - maximum_network_interfaces,
+    maximum_ipv4_addresses_per_interface, default_vcpus, hypervisor & supported_architectures
+
+    :param instance_type The instance type, e.g. m5.large
+    """
+    key = make_key("instance_type", get_region(), get_account(), name=instance_type)
+
+    def lookup():
+        with Trace.span("get_instance_type", "invoke", name=instance_type):
+            result = pulumi_aws.ec2.get_instance_type(instance_type=instance_type)
+        return {
+            "maximum_network_interfaces": result.maximum_network_interfaces,
+            "maximum_ipv4_addresses_per_interface": result.maximum_ipv4_addresses_per_interface,
+            "default_vcpus": result.default_vcpus,
+            "hypervisor": result.hypervisor,
+            "supported_architectures": list(result.supported_architectures)
+        }
+
+    return get_cache().get(key, _online("the %s instance type" % instance_type, lookup))
+
+
+def get_region_name():
+    """
+    Return the name of the current region, e.g. us-east-1. Only looked up when it is not configured
+    """
+    region = get_region()
+    if region != "default":
+        return region
+    key = make_key("region", region, get_account())
+
+    def lookup():
+        with Trace.span("get_region", "invoke"):
+            result = pulumi_aws.get_region()
+        return getattr(result, "region", None) or result.name
+
+    return get_cache().get(key, _online("the region name", lookup))
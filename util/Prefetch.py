@@ -0,0 +1,140 @@
+"""
+Start the external lookups the components need as soon as the program starts
+"""
+import asyncio
+import contextvars
+import inspect
+import threading
+import time
+from concurrent import futures
+
+from pulumi.errors import RunError
+from pulumi.runtime.sync_await import _sync_await
+
+import util.Lookup as Lookup
+import util.Trace as Trace
+import util.Util as Util
+
+
+class Prefetch(object):
+    """
+    Run lookups up front. Results land in the shared caches (util.Lookup & util.Util.get_workstation_ip), so
+    components constructed afterwards pick them up instead of looking them up again.
+
+    Provider invokes - the AMI & availability zone lookups - are started together on the calling thread & awaited at
+    once, so they overlap. An invoke waits on the engine through pulumi's event loop, which belongs to the main thread,
+    so invokes are never started from worker threads. Plain lookups such as the workstation IP's HTTP request run in
+    the background, on daemon threads, overlapping the invokes. A background lookup that hangs is given up on after
+    the timeout & cannot hold up the process exiting.
+
+    :param ami_filters A list of AMI name filters to look up, e.g. [Lookup.AMAZON_LINUX_AMI]
+    :param eks_versions A list of EKS versions whose node AMIs should be looked up
+    :param availability_zones Look up the availability zones of the current region
+    :param workstation_ip Look up the public IP of the machine running the stack, in the background
+    :param timeout Seconds to wait for the background lookups. Defaults to PAVE_LOOKUP_TIMEOUT or 30
+    """
+    def __init__(self, ami_filters=None, eks_versions=None, availability_zones=True, workstation_ip=True, timeout=None):
+        self.timeout = timeout if timeout is not None else Util.get_lookup_timeout()
+        self._lookups = {}
+        self._futures = {}
+        self._started = False
+
+        for ami_filter in (ami_filters or []):
+            self.add("ami:%s" % ami_filter, Lookup.fetch_ami_id, ami_filter)
+        for version in (eks_versions or []):
+            ami_filter = Lookup.eks_node_ami_filter(version)
+            self.add("ami:%s" % ami_filter, Lookup.fetch_ami_id, ami_filter)
+        if availability_zones:
+            self.add("availability_zones", Lookup.fetch_availability_zone_ids)
+        if workstation_ip:
+            self.add("workstation_ip", Util.get_workstation_ip, self.timeout, background=True)
+
+    def add(self, name, fn, *args, background=False):
+        """
+        Add a lookup. Must be called before start. A lookup that is not in the background runs on the calling thread
+        in wait. When it returns an awaitable, e.g. Lookup.fetch_ami_id for an invoke, that is awaited together with
+        the others
+
+        :param background Run the lookup on a daemon thread. Never for provider invokes
+        """
+        if self._started:
+            raise RunError("cannot add the %s lookup after the prefetch has started" % name)
+        self._lookups[name] = (fn, args, background)
+        return self
+
+    def start(self):
+        """
+        Start the background lookups
+        """
+        if self._started:
+            return self
+        self._started = True
+        for name, (fn, args, background) in self._lookups.items():
+            if background:
+                future = futures.Future()
+                # pulumi keeps its settings in context variables, which threads do not inherit
+                context = contextvars.copy_context()
+                threading.Thread(target=context.run, args=(_run, future, fn, args), name="pave-prefetch-%s" % name,
+                                 daemon=True).start()
+                self._futures[name] = future
+        return self
+
+    def wait(self, timeout=None):
+        """
+        Run the other lookups, wait for the background ones & return the results keyed by lookup name.
+        Raises a RunError naming the lookups that failed or did not finish in time
+        """
+        timeout = timeout if timeout is not None else self.timeout
+        self.start()
+        started = time.monotonic()
+        pending = {}
+        for name, (fn, args, background) in self._lookups.items():
+            if not background:
+                future = futures.Future()
+                _run(future, fn, args)
+                if future.exception() is None and inspect.isawaitable(future.result()):
+                    pending[name] = future.result()
+                self._futures[name] = future
+        if pending:
+            with Trace.span("prefetch", "invoke", lookups=len(pending)):
+                values = _sync_await(asyncio.gather(*pending.values(), return_exceptions=True))
+            for name, value in zip(pending, values):
+                self._futures[name] = future = futures.Future()
+                if isinstance(value, BaseException):
+                    future.set_exception(value)
+                else:
+                    future.set_result(value)
+
+        # the invokes had their share of the timeout
+        remaining = max(timeout - (time.monotonic() - started), 0)
+        done, not_done = futures.wait(list(self._futures.values()), timeout=remaining)
+        if not_done:
+            hung = sorted(name for name, future in self._futures.items() if future in not_done)
+            raise RunError("lookups did not finish within %ss: %s" % (timeout, ", ".join(hung)))
+
+        results = {}
+        failures = []
+        for name, future in self._futures.items():
+            error = future.exception()
+            if error is not None:
+                failures.append("%s (%s)" % (name, error))
+            else:
+                results[name] = future.result()
+        if failures:
+            raise RunError("lookups failed: %s" % ", ".join(failures))
+        return results
+
+
+def _run(future, fn, args):
+    try:
+        future.set_result(fn(*args))
+    except BaseException as error:
+        future.set_exception(error)
+
+
+def prefetch(ami_filters=None, eks_versions=None, availability_zones=True, workstation_ip=True, timeout=None):
+    """
+    Run the lookups & wait for them. Call at the top of __main__.py, before declaring components
+    """
+    return Prefetch(ami_filters=ami_filters, eks_versions=eks_versions, availability_zones=availability_zones,
+                    workstation_ip=workstation_ip, timeout=timeout).wait()
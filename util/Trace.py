@@ -0,0 +1,238 @@
+"""
+Opt in timing of component construction, provider invokes, HTTP calls & key generation.
+
+Set PAVE_TRACE to a file path to record spans & write them there when the program exits. PAVE_TRACE_FORMAT picks
+the format - chrome (the default), a trace for chrome://tracing or https://ui.perfetto.dev, or json, the spans plus
+a summary of the total time spent per span name. Tracing costs nothing when PAVE_TRACE is not set.
+"""
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+
+FORMATS = ("chrome", "json")
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+class Tracer(object):
+    """
+    Collect timed spans. Spans opened inside another on the same thread are recorded as its children.
+
+    :param path Where export writes the spans. Defaults to PAVE_TRACE
+    :param format chrome or json. Defaults to PAVE_TRACE_FORMAT or chrome
+    """
+    def __init__(self, path=None, format=None):
+        self.path = path or os.environ.get("PAVE_TRACE")
+        self.format = format or os.environ.get("PAVE_TRACE_FORMAT") or "chrome"
+        if self.format not in FORMATS:
+            raise ValueError("Unsupported trace format %s! %s supported" % (self.format, ", ".join(FORMATS)))
+        self.spans = []
+        # the parent URN of every registration reported to the tracer
+        self._parents = {}
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def begin(self, name, category, args=None):
+        stack = self._stack()
+        span = {
+            "id": None,
+            "name": name,
+            "category": category,
+            "start": time.perf_counter() - self._origin,
+            "duration": None,
+            "thread": threading.get_ident(),
+            "parent": stack[-1]["id"] if stack else None,
+            "args": dict(args or {})
+        }
+        with self._lock:
+            span["id"] = len(self.spans)
+            self.spans.append(span)
+        stack.append(span)
+        return span
+
+    def end(self, span, error=None):
+        span["duration"] = time.perf_counter() - self._origin - span["start"]
+        if error is not None:
+            span["args"]["error"] = "%s: %s" % (type(error).__name__, error)
+        stack = self._stack()
+        if stack and stack[-1] is span:
+            stack.pop()
+
+    def registered(self, urn, parent):
+        """
+        Record a resource registration, so component spans can count the resources under them
+        """
+        with self._lock:
+            self._parents[urn] = parent
+
+    def count_resources(self):
+        """
+        Set resources on each component span to the amount of registrations under its URN, at any depth
+        """
+        with self._lock:
+            parents = dict(self._parents)
+        children = {}
+        for urn, parent in parents.items():
+            children.setdefault(parent, []).append(urn)
+
+        def count(urn):
+            return sum(1 + count(child) for child in children.get(urn, ()))
+        for span in self.spans:
+            urn = span["args"].get("urn")
+            if span["category"] == "component" and urn in parents:
+                span["args"]["resources"] = count(urn)
+
+    def summary(self):
+        """
+        Return the count, total & longest duration of each span name, slowest total first
+        """
+        totals = {}
+        for span in self.spans:
+            if span["duration"] is None:
+                continue
+            total = totals.setdefault(span["name"], {"name": span["name"], "category": span["category"], "count": 0,
+                                                     "total": 0.0, "max": 0.0})
+            total["count"] += 1
+            total["total"] += span["duration"]
+            total["max"] = max(total["max"], span["duration"])
+        return sorted(totals.values(), key=lambda t: t["total"], reverse=True)
+
+    def chrome_trace(self):
+        events = []
+        for span in self.spans:
+            if span["duration"] is None:
+                continue
+            events.append({"name": span["name"], "cat": span["category"], "ph": "X", "pid": os.getpid(),
+                           "tid": span["thread"], "ts": span["start"] * 1e6, "dur": span["duration"] * 1e6,
+                           "args": span["args"]})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export(self, path=None, format=None):
+        """
+        Write the spans to path in format. Defaults to the tracer's own
+        """
+        path = path or self.path
+        format = format or self.format
+        self.count_resources()
+        if format == "chrome":
+            data = self.chrome_trace()
+        else:
+            data = {"spans": self.spans, "summary": self.summary()}
+        with open(path, "w") as f:
+            json.dump(data, f, indent=1, default=str)
+        return path
+
+
+class _Span(object):
+
+    def __init__(self, tracer, name, category, args):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.span = None
+
+    def __enter__(self):
+        if self.tracer is not None:
+            self.span = self.tracer.begin(self.name, self.category, self.args)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.span is not None:
+            self.tracer.end(self.span, exc)
+        return False
+
+    def set(self, key, value):
+        """
+        Attach a value to the span, e.g. a result only known at the end
+        """
+        if self.span is not None:
+            self.span["args"][key] = value
+
+
+def get_tracer():
+    """
+    Return the tracer, or None when tracing is off
+    """
+    global _tracer
+    if _tracer is None and os.environ.get("PAVE_TRACE"):
+        with _tracer_lock:
+            if _tracer is None:
+                _tracer = Tracer()
+                atexit.register(_export_at_exit, _tracer)
+    return _tracer
+
+
+def set_tracer(tracer):
+    """
+    Replace the tracer, e.g. with one that is exported by hand. None turns tracing off unless PAVE_TRACE is set
+    """
+    global _tracer
+    _tracer = tracer
+
+
+def _export_at_exit(tracer):
+    if tracer.path and tracer.spans:
+        tracer.export()
+
+
+def registered(urn, parent):
+    """
+    Report a resource registration to the tracer, if any. Called where registrations are seen, e.g. a mock monitor
+    """
+    tracer = get_tracer()
+    if tracer is not None:
+        tracer.registered(urn, parent)
+
+
+def span(name, category="", /, **args):
+    """
+    Time the body of a with statement
+
+        with Trace.span("get_ami", "invoke", filter=name_filter):
+            ...
+    """
+    return _Span(get_tracer(), name, category, args)
+
+
+def traced(category, name=None):
+    """
+    Time every call of a function
+    """
+    def decorate(fn):
+        span_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if get_tracer() is None:
+                return fn(*args, **kwargs)
+            with span(span_name, category):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def component(init):
+    """
+    Time a component's __init__ & record its URN, under which the tracer counts the resources it registered
+    """
+    @functools.wraps(init)
+    def wrapper(self, name, *args, **kwargs):
+        if get_tracer() is None:
+            return init(self, name, *args, **kwargs)
+        with span(type(self).__name__, "component", name=name) as s:
+            init(self, name, *args, **kwargs)
+            # the URN resolves once the component registered, after the span ends
+            self.urn.apply(functools.partial(s.set, "urn"))
+    return wrapper
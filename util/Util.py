@@ -1,18 +1,70 @@
-from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives.asymmetric import rsa
-from cryptography.hazmat.primitives import serialization
-import requests
+import os
+import threading
 
+from pulumi.errors import RunError
 
-def create_bastion_to_private_keypair():
-    private_key_object = rsa.generate_private_key(public_exponent=65537, key_size=2048, backend=default_backend())
-    public_key_string = private_key_object.public_key().public_bytes(serialization.Encoding.OpenSSH,
-                                                                      serialization.PublicFormat.OpenSSH)
-    private_key_string = private_key_object.private_bytes(serialization.Encoding.PEM,
-                                                         serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+import util.Trace as Trace
 
-    return {'public': public_key_string.decode('utf-8'), 'private': private_key_string.decode('utf-8')}
+WORKSTATION_IP_URL = "http://ifconfig.me/ip"
+DEFAULT_TIMEOUT = 30
 
-def get_workstation_ip():
-    ip = requests.get("http://ifconfig.me/ip")
-    return ip.text
+_workstation_ip = None
+_workstation_ip_lock = threading.Lock()
+
+
+def create_bastion_to_private_keypair(name=None, algorithm="rsa"):
+    """
+    Return a key pair for the bastion to reach the private servers with - the OpenSSH public & PEM private key
+
+    :param name Reuse the key pair called name, from the key store or generated in the background by util.Keys.
+           A new key pair is generated on every call when None
+    :param algorithm rsa or ed25519
+    """
+    import util.Keys as Keys
+    if name is not None:
+        keys = Keys.keypair(name, algorithm)
+    else:
+        keys = Keys.generate_keypair(algorithm)
+    return {'public': keys['public'], 'private': keys['private']}
+
+
+def is_offline():
+    """
+    True when PAVE_OFFLINE is set. No external lookups are made; overrides & cached results are used instead
+    """
+    return os.environ.get("PAVE_OFFLINE", "").lower() in ("1", "true", "yes")
+
+
+def get_lookup_timeout():
+    return float(os.environ.get("PAVE_LOOKUP_TIMEOUT", DEFAULT_TIMEOUT))
+
+
+def get_workstation_ip(timeout=None):
+    """
+    Return the public IP of the machine running the stack. The first answer is kept for the rest of the process, but a
+    caller does not wait on a lookup already in flight - it makes its own, with its own timeout.
+    PAVE_WORKSTATION_IP overrides the lookup, e.g. on CI runners with no or slow egress
+
+    :param timeout Seconds to wait for the lookup. Defaults to PAVE_LOOKUP_TIMEOUT or 30
+    """
+    global _workstation_ip
+    with _workstation_ip_lock:
+        if _workstation_ip is not None:
+            return _workstation_ip
+        override = os.environ.get("PAVE_WORKSTATION_IP")
+        if override:
+            _workstation_ip = override
+            return _workstation_ip
+    if is_offline():
+        raise RunError("PAVE_OFFLINE is set but PAVE_WORKSTATION_IP is not. Set it to the IP to whitelist")
+
+    # the request is made without the lock, so a caller is never held up by a lookup that already timed out for
+    # someone else, e.g. a prefetch. Only the result is published under it
+    import requests
+    with Trace.span("get_workstation_ip", "http", url=WORKSTATION_IP_URL):
+        response = requests.get(WORKSTATION_IP_URL, timeout=timeout or get_lookup_timeout())
+        response.raise_for_status()
+    with _workstation_ip_lock:
+        if _workstation_ip is None:
+            _workstation_ip = response.text.strip()
+        return _workstation_ip
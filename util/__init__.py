@@ -0,0 +1,9 @@
+import util.Lazy as Lazy
+
+Lazy.exports(__name__, {
+    "KeyProvider": "util.Keys",
+    "KeyStore": "util.Keys",
+    "LookupCache": "util.Cache",
+    "prefetch": "util.Prefetch",
+    "Tracer": "util.Trace",
+})
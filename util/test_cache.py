@@ -0,0 +1,64 @@
+import os
+import shutil
+import tempfile
+import time
+from unittest import TestCase
+
+from util.Cache import LookupCache, make_key
+
+
+class TestLookupCache(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "cache.json")
+        self.calls = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def lookup(self):
+        self.calls += 1
+        return "ami-%d" % self.calls
+
+    def test_looks_up_each_key_once(self):
+        cache = LookupCache(path=self.path)
+        key = make_key("ami", "us-east-1", "default", name="amzn-ami-hvm-*")
+        self.assertEqual("ami-1", cache.get(key, self.lookup))
+        self.assertEqual("ami-1", cache.get(key, self.lookup))
+        self.assertEqual(1, self.calls)
+
+    def test_persists_between_processes(self):
+        key = make_key("ami", "us-east-1", "default")
+        LookupCache(path=self.path).get(key, self.lookup)
+        self.assertEqual("ami-1", LookupCache(path=self.path).get(key, self.lookup))
+        self.assertEqual(1, self.calls)
+
+    def test_expired_entries_are_looked_up_again(self):
+        key = make_key("ami", "us-east-1", "default")
+        LookupCache(path=self.path).get(key, self.lookup)
+        time.sleep(0.01)
+        self.assertEqual("ami-2", LookupCache(path=self.path, ttl=0.001).get(key, self.lookup))
+
+    def test_pin_ignores_ttl_and_refresh_ignores_stored_entries(self):
+        key = make_key("ami", "us-east-1", "default")
+        LookupCache(path=self.path).get(key, self.lookup)
+        time.sleep(0.01)
+        self.assertEqual("ami-1", LookupCache(path=self.path, ttl=0.001, mode="pin").get(key, self.lookup))
+
+        refreshed = LookupCache(path=self.path, mode="refresh")
+        self.assertEqual("ami-2", refreshed.get(key, self.lookup))
+        self.assertEqual("ami-2", refreshed.get(key, self.lookup))
+
+    def test_evicts_least_recently_used(self):
+        cache = LookupCache(path=self.path, max_entries=2)
+        first, second, third = [make_key("ami", "us-east-1", "default", name=str(i)) for i in range(3)]
+        cache.get(first, self.lookup)
+        cache.get(second, self.lookup)
+        cache.get(third, self.lookup)
+        reloaded = LookupCache(path=self.path)
+        self.assertNotIn(first, reloaded)
+        self.assertIn(third, reloaded)
+
+    def test_keys_differ_by_region(self):
+        self.assertNotEqual(make_key("ami", "us-east-1", "default"), make_key("ami", "us-west-2", "default"))
@@ -0,0 +1,107 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import TestCase, mock
+
+from pulumi.errors import RunError
+
+import bench.Mocks as Mocks
+import util.Keys as Keys
+import util.Util as Util
+
+
+class TestKeys(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, "keys.json")
+
+    def provider(self, passphrase="secret"):
+        provider = Keys.KeyProvider(Keys.KeyStore(self.path, passphrase))
+        self.addCleanup(provider.shutdown)
+        return provider
+
+    def test_generate(self):
+        rsa = Keys.generate_keypair(Keys.RSA)
+        self.assertTrue(rsa["public"].startswith("ssh-rsa "))
+        self.assertIn("BEGIN PRIVATE KEY", rsa["private"])
+        ed25519 = Keys.generate_keypair(Keys.ED25519)
+        self.assertTrue(ed25519["public"].startswith("ssh-ed25519 "))
+        self.assertIn("BEGIN OPENSSH PRIVATE KEY", ed25519["private"])
+        with self.assertRaises(RunError):
+            Keys.generate_keypair("dsa")
+
+    def test_reuses_stored_keys_across_runs(self):
+        first = self.provider().get("bastion", Keys.ED25519)
+        second = self.provider().get("bastion", Keys.ED25519)
+        self.assertEqual(first, second)
+        with open(self.path) as f:
+            self.assertNotIn(first["private"].splitlines()[1], f.read())
+
+    def test_wrong_passphrase(self):
+        self.provider().get("bastion", Keys.ED25519)
+        with self.assertRaisesRegex(RunError, "PAVE_KEY_PASSPHRASE"):
+            self.provider("other").get("bastion", Keys.ED25519)
+
+    def test_nothing_stored_without_a_passphrase(self):
+        provider = self.provider(passphrase="")
+        first = provider.get("bastion", Keys.ED25519)
+        self.assertEqual(first, provider.get("bastion", Keys.ED25519))
+        self.assertFalse(os.path.exists(self.path))
+        self.assertNotEqual(first, self.provider(passphrase="").get("bastion", Keys.ED25519))
+
+    def test_create_bastion_to_private_keypair(self):
+        Keys.set_provider(self.provider())
+        self.addCleanup(Keys.set_provider, None)
+        self.assertEqual(Util.create_bastion_to_private_keypair("bastion", "ed25519"),
+                         Util.create_bastion_to_private_keypair("bastion", "ed25519"))
+        self.assertEqual(["private", "public"], sorted(Util.create_bastion_to_private_keypair()))
+
+    def test_algorithm_must_match_the_request(self):
+        provider = self.provider()
+        provider.request("bastion", Keys.RSA)
+        with self.assertRaises(RunError):
+            provider.request("bastion", Keys.ED25519)
+
+    def test_store_is_read_without_the_provider_lock(self):
+        provider = self.provider()
+        reading = threading.Event()
+        release = threading.Event()
+        read = provider.store.get
+
+        def slow_get(name):
+            if name == "slow":
+                reading.set()
+                release.wait(5)
+            return read(name)
+        with mock.patch.object(provider.store, "get", slow_get):
+            slow = threading.Thread(target=provider.request, args=("slow", Keys.ED25519), daemon=True)
+            slow.start()
+            reading.wait(5)
+            start = time.time()
+            self.assertTrue(provider.get("fast", Keys.ED25519)["public"].startswith("ssh-ed25519 "))
+            self.assertLess(time.time() - start, 2)
+            release.set()
+            slow.join()
+
+    def test_output_is_secret(self):
+        provider = self.provider()
+        secret = []
+        Mocks.run(lambda: secret.append(asyncio.ensure_future(provider.output("bastion", Keys.ED25519).is_secret())))
+        self.assertTrue(secret[0].result())
+
+    @mock.patch.dict(os.environ, {"PAVE_WORKSTATION_IP": Mocks.WORKSTATION_IP})
+    def test_server_user_data_from_output(self):
+        from compute.Server import Server
+        provider = self.provider()
+        keys = provider.output("bastion", Keys.ED25519)
+        monitor = Mocks.run(lambda: Server("bastion", tags={"type": "bastion"}, user_data_dict={
+            "type": "bastion", "private": keys.apply(lambda k: k["private"])}), Mocks.BenchMocks())
+        instance = [r for r in monitor.registrations if r["type"] == "aws:ec2/instance:Instance"][0]
+        # the key stays secret in the user data
+        user_data = monitor.resources[instance["urn"]].state["userData"]
+        self.assertIn(provider.get("bastion", Keys.ED25519)["private"], user_data["value"])
@@ -0,0 +1,95 @@
+import os
+import threading
+import time
+from unittest import TestCase, mock
+
+from pulumi.errors import RunError
+
+import bench.Mocks as Mocks
+import util.Util as Util
+from util.Prefetch import Prefetch
+
+
+class SlowMocks(Mocks.BenchMocks):
+    """
+    Take 0.2s to answer each invoke & keep the time each one started
+    """
+    def __init__(self):
+        Mocks.BenchMocks.__init__(self)
+        self.started = []
+
+    def call(self, args):
+        self.started.append(time.time())
+        time.sleep(0.2)
+        return Mocks.BenchMocks.call(self, args)
+
+
+class TestPrefetch(TestCase):
+
+    def prefetch(self, timeout=5):
+        return Prefetch(availability_zones=False, workstation_ip=False, timeout=timeout)
+
+    def test_runs_background_lookups_concurrently(self):
+        prefetch = self.prefetch()
+        for i in range(4):
+            prefetch.add("sleep-%d" % i, time.sleep, 0.2, background=True)
+        start = time.time()
+        results = prefetch.wait()
+        self.assertLess(time.time() - start, 0.6)
+        self.assertEqual(4, len(results))
+
+    def test_names_hung_lookups(self):
+        prefetch = self.prefetch(timeout=0.05).add("hangs", time.sleep, 1, background=True)
+        with self.assertRaisesRegex(RunError, "hangs"):
+            prefetch.wait()
+
+    def test_invokes_run_on_the_calling_thread(self):
+        def thread():
+            return threading.current_thread()
+        prefetch = self.prefetch().add("invoke", thread).add("http", thread, background=True)
+        results = prefetch.wait()
+        self.assertIs(threading.current_thread(), results["invoke"])
+        self.assertTrue(results["http"].daemon)
+
+    def test_invokes_overlap(self):
+        mocks = SlowMocks()
+        results = []
+        Mocks.run(lambda: results.append(Prefetch(ami_filters=["a-*", "b-*", "c-*"], workstation_ip=False).wait()), mocks)
+        self.assertEqual(4, len(mocks.started))
+        # every invoke starts before the first one answers
+        self.assertLess(max(mocks.started) - min(mocks.started), 0.2)
+        self.assertEqual(Mocks.ZONE_IDS, results[0]["availability_zones"])
+
+    @mock.patch.dict(os.environ, {}, clear=True)
+    @mock.patch.object(Util, "_workstation_ip", None)
+    def test_workstation_ip_lookup_does_not_block_other_callers(self):
+        # the first request hangs, as one that a prefetch gave up on
+        release = threading.Event()
+        answers = iter(["192.0.2.1", "192.0.2.2"])
+
+        def get(url, timeout):
+            answer = next(answers)
+            if answer == "192.0.2.1":
+                release.wait(5)
+            return mock.Mock(text=answer)
+        with mock.patch("requests.get", get):
+            hung = threading.Thread(target=Util.get_workstation_ip, daemon=True)
+            hung.start()
+            time.sleep(0.05)
+            start = time.time()
+            self.assertEqual("192.0.2.2", Util.get_workstation_ip())
+            self.assertLess(time.time() - start, 1)
+            release.set()
+            hung.join()
+        self.assertEqual("192.0.2.2", Util.get_workstation_ip())
+
+    def test_names_failed_lookups(self):
+        prefetch = self.prefetch().add("fails", int, "not a number")
+        with self.assertRaisesRegex(RunError, "fails"):
+            prefetch.wait()
+
+    @mock.patch.dict(os.environ, {"PAVE_WORKSTATION_IP": "192.0.2.10"})
+    @mock.patch.object(Util, "_workstation_ip", None)
+    def test_workstation_ip_override(self):
+        results = Prefetch(availability_zones=False).wait()
+        self.assertEqual("192.0.2.10", results["workstation_ip"])
@@ -0,0 +1,72 @@
+import json
+import os
+import tempfile
+from unittest import TestCase, mock
+
+import bench.Mocks as Mocks
+import util.Trace as Trace
+
+
+class TestTrace(TestCase):
+
+    def setUp(self):
+        self.tracer = Trace.Tracer(format="json")
+        Trace.set_tracer(self.tracer)
+        self.addCleanup(Trace.set_tracer, None)
+
+    def test_nested_spans(self):
+        with Trace.span("outer", "test"):
+            with Trace.span("inner", "test", name="value") as inner:
+                inner.set("result", 1)
+        outer, inner = self.tracer.spans
+        self.assertEqual(outer["id"], inner["parent"])
+        self.assertEqual({"name": "value", "result": 1}, inner["args"])
+        self.assertLessEqual(inner["duration"], outer["duration"])
+
+    def test_records_errors(self):
+        with self.assertRaises(ZeroDivisionError):
+            with Trace.span("fails", "test"):
+                1 / 0
+        self.assertIn("ZeroDivisionError", self.tracer.spans[0]["args"]["error"])
+
+    def test_summary(self):
+        traced = Trace.traced("test")(lambda: None)
+        for i in range(3):
+            traced()
+        summary = self.tracer.summary()
+        self.assertEqual(1, len(summary))
+        self.assertEqual(3, summary[0]["count"])
+
+    def test_chrome_export(self):
+        with Trace.span("step", "test"):
+            pass
+        with tempfile.TemporaryDirectory() as tmp:
+            path = self.tracer.export(os.path.join(tmp, "trace.json"), "chrome")
+            with open(path) as f:
+                events = json.load(f)["traceEvents"]
+        self.assertEqual(["step"], [e["name"] for e in events])
+        self.assertEqual("X", events[0]["ph"])
+
+    @mock.patch.dict(os.environ, {"PAVE_WORKSTATION_IP": Mocks.WORKSTATION_IP})
+    def test_counts_component_resources(self):
+        from network.Network import Network
+        monitor = Mocks.run(lambda: Network("network", subnet_count=3), Mocks.BenchMocks())
+        self.tracer.count_resources()
+        network = [s for s in self.tracer.spans if s["category"] == "component"][0]
+        self.assertEqual("network", network["args"]["name"])
+        # everything but the component itself
+        self.assertEqual(len(monitor.registrations) - 1, network["args"]["resources"])
+        self.assertIn("get_availability_zones", [s["name"] for s in self.tracer.spans])
+
+    def test_one_span_per_key(self):
+        from util.Util import create_bastion_to_private_keypair
+        create_bastion_to_private_keypair(algorithm="ed25519")
+        self.assertEqual(["generate_keypair"], [s["name"] for s in self.tracer.spans if s["category"] == "crypto"])
+
+    def test_off(self):
+        Trace.set_tracer(None)
+        with mock.patch.dict(os.environ, {}, clear=True):
+            self.assertIsNone(Trace.get_tracer())
+            with Trace.span("ignored", "test"):
+                pass
+        self.assertEqual([], self.tracer.spans)